@@ -1,32 +1,261 @@
-from app.AI.optimizer.sa_optimizer import simulated_annealing
+import os
+import queue
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from app.AI.optimizer.sa_optimizer import POOL_CONTEXT, INITIAL_ACCEPTANCE, simulated_annealing, parallel_tempering
+from app.AI.optimizer.greedy import greedy_layout_genome, greedy_pack
+from app.AI.optimizer.brkga import brkga
+from app.AI.optimizer.beam import BEAM_WIDTH, beam_search
 from app.AI.optimizer.box import Box
+from app.AI.optimizer.heightmap import DEFAULT_RESOLUTION
+from app.AI.optimizer.prescreen import prescreen
+from app.AI.optimizer import instrumentation
+from app.core.config import AI_OPTIMIZER_WORKERS, AI_OPTIMIZER_PATIENCE, AI_OPTIMIZER_STATS, AI_HEIGHTMAP_RESOLUTION
 
-def run_ai_optimizer(container, boxes_raw, runs=3):
+# One independent annealing restart. Module-level so the process pool can pickle it;
+# each run draws from its own random.Random(seed), so its layout does not depend on which process runs it.
+# Returns (solution, cost, stats); stats are the instrumentation counters when collected in a pool worker, else None.
+# initial, initial_acceptance: starting genome and uphill acceptance rate, see simulated_annealing.
+def run_single(boxes, container, placement_mode, seed, deadline=None, patience=None, progress_callback=None,
+               collect_stats=False, initial=None, heightmap_resolution=DEFAULT_RESOLUTION,
+               initial_acceptance=INITIAL_ACCEPTANCE):
+    worker_stats = instrumentation.start_worker_stats(collect_stats)
+    solution, cost = simulated_annealing(
+        boxes, container, placement_mode=placement_mode, deadline=deadline, patience=patience,
+        progress_callback=progress_callback, seed=seed, initial=initial, heightmap_resolution=heightmap_resolution,
+        initial_acceptance=initial_acceptance
+    )
+    return solution, cost, instrumentation.snapshot() if worker_stats else None
 
-    container = {
+# Progress callback for restarts running in pool workers: forwards (run, event) through a manager queue
+# to the parent process, which relays it to the caller's callback
+class QueueReporter:
+    def __init__(self, progress_queue, run):
+        self.progress_queue = progress_queue
+        self.run = run
+
+    def __call__(self, event):
+        self.progress_queue.put((self.run, event))
+
+# Placed boxes in the API result format, in loading order
+def format_results(solution):
+    sorted_solution = sorted(solution, key=lambda b: (b.z, b.y, b.x))
+
+    return [{
+        "item_id": box.item_id,
+        "placement_order": idx + 1,
+        "x": box.x * 100,  # Convert to centimeters
+        "y": box.y * 100,  # Convert to centimeters
+        "z": box.z * 100,  # Convert to centimeters
+        "width": box.width * 100,  # Convert to centimeters
+        "height": box.height * 100,  # Convert to centimeters
+        "depth": box.depth * 100,  # Convert to centimeters
+        "is_fragile": box.is_fragile
+    } for idx, box in enumerate(sorted_solution)]
+
+def container_in_meters(container):
+    return {
         "width": float(container["width"] / 100),  # Convert to meters
         "height": float(container["height"] / 100),  # Convert to meters
         "depth": float(container["depth"] / 100)  # Convert to meters
     }
 
+def boxes_in_meters(boxes_raw):
+    return [
+        Box(
+            item_id=box["item_id"],
+            original_width=box["width"] / 100,  # Convert to meters
+            original_height=box["height"] / 100,  # Convert to meters
+            original_depth=box["depth"] / 100,  # Convert to meters
+            is_fragile=box.get("is_fragile", False),
+            unique_id=idx + 1,  # Position in the request, so IDs do not depend on earlier requests
+            orientation_constraint=box.get("orientation")  # Item.orientation, e.g. "Face Up"; None rotates freely
+        ) for idx, box in enumerate(boxes_raw)
+    ]
+
+def infeasible_result(reason):
+    return {
+        "status": "error",
+        "cost": float("inf"),
+        "results": [],
+        "message": f"Unable to pack all boxes into container: {reason['message']}",
+        "reason": reason
+    }
+
+# Millisecond pre-screen of the raw (centimeter) request, see optimizer/prescreen.py.
+# Returns None if the instance may be packable, otherwise the structured reason (sizes in meters).
+def check_feasibility(container, boxes_raw):
+    return prescreen(container_in_meters(container), boxes_in_meters(boxes_raw))
+
+# "anneal": `runs` independent simulated annealing restarts; "tempering": one parallel tempering run;
+# "brkga": one biased random-key genetic algorithm run, see optimizer/brkga.py
+STRATEGIES = ("anneal", "tempering", "brkga")
+
+# Latency/quality trade-off. "search": the full strategy; "greedy": one first-fit decreasing pass (tens of
+# milliseconds: about 15 ms for 40 items and 80 ms for 100 on one core, see optimizer/greedy.py); "refine": a single
+# annealing run that starts cold from the greedy layout and improves it; "beam": deterministic beam search (see
+# optimizer/beam.py), meant for instances with hundreds of items
+MODES = ("search", "greedy", "refine", "beam")
+REFINE_ACCEPTANCE = 0.2  # Starting uphill acceptance of the "refine" run (the search starts at INITIAL_ACCEPTANCE)
+
+# placement_mode: "contact" (default) or "heightmap", see PLACEMENT_MODES in cost_functions.py
+# heightmap_resolution: cell size of the height map in cm, used in placement mode "heightmap" (default
+# AI_HEIGHTMAP_RESOLUTION). Finer cells find more positions between boxes; each placement scans every cell.
+# strategy: one of STRATEGIES, used in mode "search"
+# mode: one of MODES; "greedy", "refine" and "beam" ignore runs, workers and strategy
+# beam_width: partial layouts kept per step in mode "beam"; runtime grows linearly with it
+# workers: processes used for the restarts, tempering replicas or BRKGA batches (default AI_OPTIMIZER_WORKERS, else one per CPU core).
+# seed: base seed; restart i uses seed + i. None draws a fresh base seed. The seed used is returned in the result,
+# and the same seed gives the same layout unless time_budget_ms cuts the search short.
+# time_budget_ms: wall-clock budget for the whole search; when it runs out the best layout found so far is returned,
+# and a successful result has "time_limited": True (False when the search finished on its own).
+# patience: stop a search after this many iterations without improvement (default AI_OPTIMIZER_PATIENCE, 0 disables).
+# progress_callback: called in this process with progress events: run, iteration, temperature, current_cost, best_cost,
+# progress (0..1 over all runs) and, whenever a run finds a new best, layout: that run's best layout in the result format.
+# collect_stats: add a "stats" block of engine counters and phase timers to the result (default AI_OPTIMIZER_STATS).
+def run_ai_optimizer(container, boxes_raw, runs=3, placement_mode="contact", workers=None, seed=None, strategy="anneal",
+                     time_budget_ms=None, patience=None, progress_callback=None, collect_stats=None, mode="search",
+                     beam_width=BEAM_WIDTH, heightmap_resolution=None):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+    if heightmap_resolution is None:
+        heightmap_resolution = AI_HEIGHTMAP_RESOLUTION
+    if heightmap_resolution <= 0:
+        raise ValueError(f"Height map resolution must be positive, got {heightmap_resolution}")
+
+    if collect_stats is None:
+        collect_stats = AI_OPTIMIZER_STATS
+    if not collect_stats:
+        return optimize(container, boxes_raw, runs, placement_mode, workers, seed, strategy, time_budget_ms, patience,
+                        progress_callback, mode, beam_width, heightmap_resolution=heightmap_resolution)
+
+    instrumentation.enable()
+    instrumentation.reset()
+    start = time.perf_counter()
+    try:
+        result = optimize(container, boxes_raw, runs, placement_mode, workers, seed, strategy, time_budget_ms, patience,
+                          progress_callback, mode, beam_width, collect_stats=True,
+                          heightmap_resolution=heightmap_resolution)
+        stats = instrumentation.summary()
+        stats["wall_time_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["stats"] = stats
+        return result
+    finally:
+        instrumentation.enable(False)
+        instrumentation.reset()
+
+def optimize(container, boxes_raw, runs, placement_mode, workers, seed, strategy, time_budget_ms, patience,
+             progress_callback, mode="search", beam_width=BEAM_WIDTH, collect_stats=False, heightmap_resolution=None):
+
+    deadline = time.time() + time_budget_ms / 1000 if time_budget_ms else None
+    if patience is None:
+        patience = AI_OPTIMIZER_PATIENCE
+    patience = patience or None
+
+    container = container_in_meters(container)
+    resolution = heightmap_resolution / 100 if heightmap_resolution else DEFAULT_RESOLUTION  # Convert to meters
+
     best_solution = None
     best_cost = float("inf")
 
-    for _ in range(runs):
-        # Step 1: Create Box instances and sort them by volume in descending order (to prevent small boxes from blocking larger ones)
-        boxes = sorted([
-            Box(
-                item_id=box["item_id"],
-                original_width=box["width"] / 100,  # Convert to meters
-                original_height=box["height"] / 100,  # Convert to meters
-                original_depth=box["depth"] / 100,  # Convert to meters
-                is_fragile=box.get("is_fragile", False)
-            ) for box in boxes_raw
-        ], key=lambda b: b.width * b.height * b.depth, reverse=True)
-
-        # Step 2: Call simulated annealing optimizer
-        solution, cost = simulated_annealing(boxes, container)
+    # Step 1: Create Box instances and sort them by volume in descending order (to prevent small boxes from blocking larger ones)
+    boxes = sorted(boxes_in_meters(boxes_raw), key=lambda b: b.width * b.height * b.depth, reverse=True)
+
+    # Step 2: Reject instances that provably cannot fit before spending any search time on them
+    reason = prescreen(container, boxes)
+    if reason:
+        print(f"❌ Pre-screen rejected the instance: {reason['message']}")
+        return infeasible_result(reason)
 
+    if seed is None:
+        seed = random.randrange(2**32)
+    seeds = [seed + run for run in range(runs)]
+
+    if workers is None:
+        workers = AI_OPTIMIZER_WORKERS or os.cpu_count() or 1
+
+    # Turn optimizer progress events into API progress events
+    run_progress = [0.0] * (runs if mode == "search" and strategy == "anneal" else 1)
+    def emit(run, event):
+        run_progress[run] = max(run_progress[run], event["progress"])  # Patience-based progress can move back
+        event = dict(event, run=run, progress=sum(run_progress) / len(run_progress))
+        solution = event.pop("best_solution")
+        if solution is not None:
+            event["layout"] = format_results(solution)
+        progress_callback(event)
+
+    # Step 3: Call the optimizer: the greedy pass, one annealing run from the greedy layout, beam search,
+    # tempering replicas, the genetic algorithm, or one independent annealing restart per seed
+    if mode == "greedy":
+        outcomes = [greedy_pack(boxes, container, placement_mode, resolution) + (None,)]
+    elif mode == "beam":
+        outcomes = [beam_search(
+            boxes, container, beam_width=beam_width, placement_mode=placement_mode, deadline=deadline,
+            progress_callback=(lambda event: emit(0, event)) if progress_callback else None,
+            heightmap_resolution=resolution
+        ) + (None,)]
+    elif mode == "refine":
+        outcomes = [run_single(
+            boxes, container, placement_mode, seed, deadline, patience,
+            (lambda event: emit(0, event)) if progress_callback else None, collect_stats,
+            initial=greedy_layout_genome(boxes, container, placement_mode, resolution), heightmap_resolution=resolution,
+            initial_acceptance=REFINE_ACCEPTANCE
+        )]
+    elif strategy == "tempering":
+        outcomes = [parallel_tempering(
+            boxes, container, workers=workers, placement_mode=placement_mode, deadline=deadline, patience=patience,
+            progress_callback=(lambda event: emit(0, event)) if progress_callback else None, collect_stats=collect_stats,
+            seed=seed, heightmap_resolution=resolution
+        ) + (None,)]
+    elif strategy == "brkga":
+        outcomes = [brkga(
+            boxes, container, workers=workers, placement_mode=placement_mode, deadline=deadline, patience=patience,
+            progress_callback=(lambda event: emit(0, event)) if progress_callback else None, collect_stats=collect_stats,
+            seed=seed, heightmap_resolution=resolution
+        ) + (None,)]
+    elif min(workers, runs) <= 1:
+        outcomes = [
+            run_single(
+                boxes, container, placement_mode, run_seed, deadline, patience,
+                (lambda event, run=run: emit(run, event)) if progress_callback else None, collect_stats,
+                heightmap_resolution=resolution
+            ) for run, run_seed in enumerate(seeds)
+        ]
+    elif progress_callback is None:
+        with ProcessPoolExecutor(max_workers=min(workers, runs), mp_context=POOL_CONTEXT) as pool:
+            outcomes = list(pool.map(
+                run_single, [boxes] * runs, [container] * runs, [placement_mode] * runs, seeds,
+                [deadline] * runs, [patience] * runs, [None] * runs, [collect_stats] * runs, [None] * runs,
+                [resolution] * runs
+            ))
+    else:
+        # Workers report through a manager queue that this process drains while the restarts run
+        with ProcessPoolExecutor(max_workers=min(workers, runs), mp_context=POOL_CONTEXT) as pool, \
+                POOL_CONTEXT.Manager() as manager:
+            progress_queue = manager.Queue()
+            futures = [
+                pool.submit(
+                    run_single, boxes, container, placement_mode, run_seed, deadline, patience,
+                    QueueReporter(progress_queue, run), collect_stats, heightmap_resolution=resolution
+                ) for run, run_seed in enumerate(seeds)
+            ]
+            while True:
+                pending = wait(futures, timeout=0)[1]
+                try:
+                    while True:
+                        emit(*progress_queue.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+                if not pending:
+                    break
+            outcomes = [future.result() for future in futures]
+
+    # Keep the best restart; ties go to the lowest seed so the result does not depend on the worker count
+    for solution, cost, stats in outcomes:
+        instrumentation.merge(stats)
         if cost < best_cost:
             best_cost = cost
             best_solution = solution
@@ -36,25 +265,14 @@ def run_ai_optimizer(container, boxes_raw, runs=3):
             "status": "error",
             "cost": float("inf"),
             "results": [],
-            "message": "Unable to pack all boxes into container"
+            "message": "Unable to pack all boxes into container",
+            "seed": seed
         }
 
-    sorted_solution = sorted(best_solution, key=lambda b: (b.z, b.y, b.x))
-
-    results = [{
-        "item_id": box.item_id,
-        "placement_order": idx + 1,
-        "x": box.x * 100,  # Convert to centimeters
-        "y": box.y * 100,  # Convert to centimeters
-        "z": box.z * 100,  # Convert to centimeters
-        "width": box.width * 100,  # Convert to centimeters
-        "height": box.height * 100,  # Convert to centimeters
-        "depth": box.depth * 100,  # Convert to centimeters
-        "is_fragile": box.is_fragile
-    } for idx, box in enumerate(sorted_solution)]
-
     return {
         "status": "success",
         "cost": best_cost,
-        "results": results
+        "results": format_results(best_solution),
+        "seed": seed,
+        "time_limited": deadline is not None and time.time() >= deadline
     }
\ No newline at end of file
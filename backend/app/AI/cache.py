@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from app.AI.ai import run_ai_optimizer
+from app.AI.models import OptimizationResult
+from app.AI.optimizer.box import normalize_orientation
+from app.core.config import AI_RESULT_CACHE_SIZE, AI_RESULT_CACHE_DB_SIZE
+
+# This file caches optimization results by content. Two requests with the same container dimensions and the same
+# multiset of boxes (size + fragile flag + orientation constraint) get the same layout, whatever their item IDs are, so the key is a hash of
+# the normalized container and the sorted box signatures. Results are stored with every item ID replaced by its box
+# signature and remapped onto the item IDs of the current request when they are served.
+# There are two layers: an in-process LRU, and the optimization_results table that survives restarts and is shared
+# between gunicorn workers. Both are bounded; the table drops its least recently used rows.
+
+memory_cache = OrderedDict()  # cache_key -> stored result
+memory_cache_lock = threading.Lock()  # Request threads and job threads share the LRU; every read-modify step holds it
+
+
+# Box identity for the cache; dimensions are compared at the 0.01 cm precision of the DB columns
+def box_signature(box):
+    return [round(float(box["width"]), 2), round(float(box["height"]), 2), round(float(box["depth"]), 2),
+            bool(box.get("is_fragile", False)), normalize_orientation(box.get("orientation"))]
+
+
+# options: optimizer settings that change the result (placement mode, strategy, ...)
+def result_cache_key(container, boxes, options=None):
+    payload = {
+        "container": [round(float(container[axis]), 2) for axis in ("width", "height", "depth")],
+        "boxes": sorted(box_signature(box) for box in boxes),
+        "options": options or {}
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def to_stored(result, boxes):
+    signatures = {box["item_id"]: box_signature(box) for box in boxes}
+    stored = copy.deepcopy(result)
+    stored.pop("stats", None)  # Describes the run that produced the result, not the cache hits serving it
+    for entry in stored["results"]:
+        entry["signature"] = signatures[entry.pop("item_id")]
+    return stored
+
+
+# Give every placed entry an item ID of the current request with the same signature, in item ID order
+def from_stored(stored, boxes):
+    available = {}
+    for box in sorted(boxes, key=lambda b: b["item_id"]):
+        available.setdefault(tuple(box_signature(box)), []).append(box["item_id"])
+    result = copy.deepcopy(stored)
+    for entry in result["results"]:
+        entry["item_id"] = available[tuple(entry.pop("signature"))].pop(0)
+    return result
+
+
+def remember(cache_key, stored):
+    with memory_cache_lock:
+        memory_cache[cache_key] = stored
+        memory_cache.move_to_end(cache_key)
+        while len(memory_cache) > AI_RESULT_CACHE_SIZE:
+            memory_cache.popitem(last=False)
+
+
+def load_result(db, cache_key):
+    with memory_cache_lock:
+        stored = memory_cache.get(cache_key)
+        if stored is not None:
+            memory_cache.move_to_end(cache_key)
+            return stored
+
+    row = db.query(OptimizationResult).filter(OptimizationResult.cache_key == cache_key).first()
+    if row is None:
+        return None
+    row.last_used_at = datetime.utcnow()
+    db.commit()
+    stored = json.loads(row.result)
+    remember(cache_key, stored)
+    return stored
+
+
+def save_result(db, cache_key, stored):
+    remember(cache_key, stored)
+    try:
+        row = db.query(OptimizationResult).filter(OptimizationResult.cache_key == cache_key).first()
+        if row is None:
+            row = OptimizationResult(cache_key=cache_key)
+            db.add(row)
+        row.result = json.dumps(stored)
+        row.last_used_at = datetime.utcnow()
+        db.flush()
+
+        excess = db.query(OptimizationResult).count() - AI_RESULT_CACHE_DB_SIZE
+        if excess > 0:
+            oldest = db.query(OptimizationResult.id).order_by(OptimizationResult.last_used_at).limit(excess).all()
+            db.query(OptimizationResult).filter(
+                OptimizationResult.id.in_([row_id for row_id, in oldest])
+            ).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        # Another worker may have stored the same key first; the in-process layer still has the result
+        db.rollback()
+        print(f"⚠️ Could not persist optimization result: {e}")
+
+
+# run_ai_optimizer behind the result cache. Only successful results of searches that finished on their own are
+# cached: a result cut short by time_budget_ms is returned but not stored, so it is never served to requests with a
+# larger budget or none. refresh=True skips the lookup and replaces the stored result. The returned result has "cached": True when it was served from the cache.
+def run_cached_optimizer(db, container, boxes, refresh=False, **options):
+    # Unset options (e.g. no seed) fall back to the optimizer defaults and share one entry with requests that leave them out
+    options = {name: value for name, value in options.items() if value is not None}
+    # The time budget and progress reporting change how the search runs, not what it searches for (results the budget
+    # cut short are not stored, see below)
+    key_options = {name: value for name, value in options.items() if name not in ("time_budget_ms", "progress_callback")}
+    cache_key = result_cache_key(container, boxes, key_options)
+
+    if not refresh:
+        stored = load_result(db, cache_key)
+        if stored is not None:
+            print(f"♻️ Serving cached optimization result {cache_key[:12]}")
+            result = from_stored(stored, boxes)
+            result["cached"] = True
+            return result
+
+    result = run_ai_optimizer(container, boxes, **options)
+    if result.get("status") == "success" and not result.get("time_limited"):
+        save_result(db, cache_key, to_stored(result, boxes))
+    result["cached"] = False
+    return result
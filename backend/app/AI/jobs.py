@@ -0,0 +1,193 @@
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from app.AI.cache import run_cached_optimizer
+from app.AI.models import OptimizationJob, JobStatus
+from app.db.database import SessionLocal
+from app.Item.models import Item
+from app.core.config import AI_JOB_WORKERS, AI_JOB_STALE_AFTER
+
+# This file runs optimizations as background jobs so requests return right away instead of holding a gunicorn
+# worker for the whole search. submit_job() stores the job in the optimization_jobs table and hands it to a local
+# pool; clients poll the row through the job endpoints. No broker is needed: the table works on SQLite and
+# PostgreSQL, and the pool lives in the process that accepted the job.
+# The pool uses threads; the search itself runs in run_ai_optimizer's process pool when more than one worker is
+# configured, so a job thread mostly waits.
+# A job dies with its process (restart, crash, killed worker). While the process is alive a heartbeat thread stamps
+# heartbeat_at on the rows of its unfinished jobs; rows left Queued/Running without a heartbeat for
+# AI_JOB_STALE_AFTER seconds are marked Failed by fail_stale_jobs() (at startup and when a client reads the job).
+
+executor = ThreadPoolExecutor(max_workers=AI_JOB_WORKERS, thread_name_prefix="optimization-job")
+
+PROGRESS_WRITE_INTERVAL = 0.5  # Seconds between progress writes to the job row
+HEARTBEAT_INTERVAL = 10        # Seconds between heartbeat writes for the unfinished jobs of this process
+
+active_jobs = set()  # Ids of the jobs submitted in this process that have not finished yet
+active_jobs_lock = threading.Lock()
+heartbeat_thread = None
+
+
+# Write a successful result's positions back to the items
+def save_placements(db, result):
+    for item_result in result["results"]:
+        item = db.query(Item).filter(Item.item_id == item_result["item_id"]).first()
+        if item:
+            item.x = item_result["x"]
+            item.y = item_result["y"]
+            item.z = item_result["z"]
+            item.placement_order = item_result["placement_order"]
+    db.commit()
+
+
+# options: keyword arguments for run_cached_optimizer; extra: fields merged into the result (e.g. task_info)
+def submit_job(db, container, boxes, submitted_by, task_id=None, save_to_db=False, options=None, extra=None):
+    job = OptimizationJob(
+        job_id=str(uuid.uuid4()),
+        task_id=task_id,
+        submitted_by=submitted_by,
+        status=JobStatus.Queued,
+        save_to_db=save_to_db,
+        heartbeat_at=datetime.utcnow(),
+        payload=json.dumps({"container": container, "boxes": boxes, "options": options or {}, "extra": extra or {}})
+    )
+    db.add(job)
+    db.commit()
+    with active_jobs_lock:
+        active_jobs.add(job.job_id)
+    start_heartbeat()
+    executor.submit(run_job, job.job_id)
+    return job.job_id
+
+
+def start_heartbeat():
+    global heartbeat_thread
+    with active_jobs_lock:
+        if heartbeat_thread is None or not heartbeat_thread.is_alive():
+            heartbeat_thread = threading.Thread(target=heartbeat_loop, name="optimization-job-heartbeat", daemon=True)
+            heartbeat_thread.start()
+
+
+def heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with active_jobs_lock:
+            job_ids = list(active_jobs)
+        if not job_ids:
+            continue
+        db = SessionLocal()
+        try:
+            db.query(OptimizationJob).filter(OptimizationJob.job_id.in_(job_ids)).update(
+                {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Job heartbeat failed: {e}")
+        finally:
+            db.close()
+
+
+def job_is_stale(job):
+    if job.status not in (JobStatus.Queued, JobStatus.Running):
+        return False
+    last_seen = job.heartbeat_at or job.created_at
+    return last_seen is not None and datetime.utcnow() - last_seen > timedelta(seconds=AI_JOB_STALE_AFTER)
+
+
+# Mark Queued/Running jobs (all of them, or only `job_id`) whose heartbeat stopped as Failed; returns how many
+def fail_stale_jobs(db, job_id=None):
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=AI_JOB_STALE_AFTER)
+    query = db.query(OptimizationJob).filter(
+        OptimizationJob.status.in_([JobStatus.Queued, JobStatus.Running]),
+        or_(OptimizationJob.heartbeat_at < cutoff,
+            and_(OptimizationJob.heartbeat_at.is_(None), OptimizationJob.created_at < cutoff))
+    )
+    if job_id is not None:
+        query = query.filter(OptimizationJob.job_id == job_id)
+    failed = query.update({
+        "status": JobStatus.Failed,
+        "error": "Job lost: the process running it stopped before it finished",
+        "finished_at": now
+    }, synchronize_session=False)
+    db.commit()
+    return failed
+
+
+def update_job(db, job_id, **fields):
+    db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).update(fields)
+    db.commit()
+
+
+# Progress callback storing the latest event on the job row, at most every PROGRESS_WRITE_INTERVAL seconds.
+# Events only carry a layout when the best changed, so the newest layout is kept and attached to every write:
+# the row always holds the best layout so far, whenever a client starts reading it.
+def job_progress_writer(db, job_id):
+    state = {"written": 0.0, "layout": None}
+
+    def on_progress(event):
+        if "layout" in event:
+            state["layout"] = event["layout"]
+        now = time.time()
+        if now - state["written"] < PROGRESS_WRITE_INTERVAL:
+            return
+        if state["layout"] is not None:
+            event = dict(event, layout=state["layout"])
+        state["written"] = now
+        update_job(db, job_id, progress=event["progress"], progress_event=json.dumps(event), heartbeat_at=datetime.utcnow())
+
+    return on_progress
+
+
+def run_job(job_id):
+    db = SessionLocal()
+    try:
+        job = db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).first()
+        payload = json.loads(job.payload)
+        update_job(db, job_id, status=JobStatus.Running, started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        print(f"🏗️ Job {job_id} started")
+
+        result = run_cached_optimizer(
+            db, payload["container"], payload["boxes"], progress_callback=job_progress_writer(db, job_id),
+            **payload["options"]
+        )
+        if not math.isfinite(result.get("cost", 0)):
+            result["cost"] = None  # Infinity is not valid JSON for the clients
+        result.update(payload["extra"])
+
+        if job.save_to_db and result.get("status") == "success":
+            save_placements(db, result)
+
+        update_job(
+            db, job_id, status=JobStatus.Completed, progress=1.0, result=json.dumps(result), finished_at=datetime.utcnow()
+        )
+        print(f"✅ Job {job_id} finished: {result.get('status')}")
+    except Exception as e:
+        db.rollback()
+        update_job(db, job_id, status=JobStatus.Failed, error=str(e), finished_at=datetime.utcnow())
+        print(f"❌ Job {job_id} failed: {e}")
+    finally:
+        with active_jobs_lock:
+            active_jobs.discard(job_id)
+        db.close()
+
+
+def job_to_dict(job):
+    return {
+        "job_id": job.job_id,
+        "task_id": job.task_id,
+        "status": job.status.value,
+        "progress": job.progress,
+        "progress_event": json.loads(job.progress_event) if job.progress_event else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "heartbeat_at": job.heartbeat_at.isoformat() if job.heartbeat_at else None
+    }
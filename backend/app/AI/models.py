@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, Enum, ForeignKey
+import enum
+from datetime import datetime
+from app.db.database import Base
+
+# Persisted layer of the optimization result cache (see app/AI/cache.py), shared by all workers and kept across restarts
+class OptimizationResult(Base):
+    __tablename__ = "optimization_results"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+    result = Column(Text, nullable=False)  # JSON, item IDs replaced by box signatures
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class JobStatus(enum.Enum):
+    Queued = "Queued"
+    Running = "Running"
+    Completed = "Completed"
+    Failed = "Failed"
+
+# Background optimization job (see app/AI/jobs.py). The row is the only shared state, so any worker can answer a poll.
+class OptimizationJob(Base):
+    __tablename__ = "optimization_jobs"
+
+    job_id = Column(String(36), primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.task_id"), nullable=True, index=True)
+    submitted_by = Column(String(50), nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.Queued, nullable=False)
+    progress = Column(Float, default=0.0)  # 0..1
+    progress_event = Column(Text, nullable=True)  # JSON of the latest progress event, including the best layout so far
+    payload = Column(Text, nullable=False)  # JSON: container, boxes, optimizer options, save flag, extra response fields
+    result = Column(Text, nullable=True)  # JSON optimizer result once Completed
+    error = Column(Text, nullable=True)
+    save_to_db = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Last sign of life from the process running the job
@@ -0,0 +1,145 @@
+import time
+from .cost_functions import (
+    add_cost_terms, box_volume, finalize_cost, new_cost_terms, new_placed_boxes, placement_key, try_place_on_heightmap,
+    try_place_with_contact_priority
+)
+from .greedy import greedy_pack
+from .heightmap import DEFAULT_RESOLUTION
+from .sa_optimizer import should_stop
+
+# This file implements a deterministic beam search that builds the layout one box at a time, for instances where
+# random-move searches scale badly. Every step expands each of the beam_width best partial layouts with the next box
+# of each of the first BRANCH_TYPES box types still to place (largest volume first), in every allowed orientation
+# that fits, at the first free position of the placement rules. The children are scored with the running cost terms
+# of advanced_cost_function (add_cost_terms + finalize_cost on the partial layout), so scoring a child costs one
+# placement, and the beam_width cheapest survive. Identical boxes are interchangeable, so a partial layout only
+# records how many boxes of each type are left. Runtime grows linearly with beam_width.
+#
+# Scores of partial layouts holding different boxes are only a heuristic, so a wider beam alone can end worse than a
+# narrower one. The narrower beams of the halving chain beam_width, beam_width // 2, ..., 1 therefore run alongside,
+# each keeping its own best children, and the best complete layout of any of them is returned: the result is never
+# worse than with a narrower width of the chain, down to the best-first lineage of width 1. The beams mostly hold the
+# same partial layouts, and a partial layout is expanded only once per step however many beams hold it.
+#
+# All partial layouts share one PlacedBoxes: a layout is loaded by truncating it to the placements it has in common
+# with the layout loaded before and appending the rest, and layouts are expanded in sorted order so that siblings
+# (which share everything but their last box) follow each other.
+
+BEAM_WIDTH = 4
+BRANCH_TYPES = 2
+
+
+# Boxes grouped by placement_key, largest volume first: [(representative box, [box indices])]
+def box_types(boxes):
+    types = {}
+    for idx, box in enumerate(boxes):
+        types.setdefault(placement_key(box), (box, []))[1].append(idx)
+    return sorted(types.values(), key=lambda group: box_volume(group[0]), reverse=True)
+
+
+# Returns (solution, cost) like simulated_annealing: positioned Box copies, or (None, inf) if no layout places every
+# box. The first-fit decreasing layout is returned instead when it is cheaper.
+# deadline: when it passes, the beam narrows to its best layout and completes that one first-fit.
+# progress_callback (if given) receives an event after every step, with the best partial cost as current_cost and best_cost.
+def beam_search(boxes, container, beam_width=BEAM_WIDTH, branch_types=BRANCH_TYPES, placement_mode="contact",
+                deadline=None, progress_callback=None, heightmap_resolution=DEFAULT_RESOLUTION):
+    beam_width = max(1, beam_width)
+    types = box_types(boxes)
+    placed_boxes = new_placed_boxes(container, placement_mode, heightmap_resolution=heightmap_resolution)
+    loaded = []  # Placements currently in placed_boxes
+
+    def materialize(placement):
+        type_idx, orientation, x, y, z = placement
+        box = types[type_idx][0].copy()
+        box.rotate(orientation)
+        box.x, box.y, box.z = x, y, z
+        return box
+
+    def load(placements):
+        prefix = 0
+        limit = min(len(loaded), len(placements))
+        while prefix < limit and loaded[prefix] == placements[prefix]:
+            prefix += 1
+        placed_boxes.truncate(prefix)
+        del loaded[prefix:]
+        for placement in placements[prefix:]:
+            placed_boxes.append(materialize(placement))
+            loaded.append(placement)
+
+    def place(box):
+        if placement_mode == "heightmap":
+            return try_place_on_heightmap(box, placed_boxes, container)
+        return try_place_with_contact_priority(box, placed_boxes, container, greedy=True)
+
+    # Children of one partial layout: (score, placements, terms, remaining count per type)
+    def expand(placements, terms, remaining, branch):
+        load(placements)
+        children = []
+        candidates = [t for t, left in enumerate(remaining) if left][:branch]
+        for type_idx in candidates:
+            box = types[type_idx][0].copy()
+            for orientation in range(len(box.orientation)):
+                box.rotate(orientation)
+                if not place(box):
+                    continue
+                child_terms = dict(terms)
+                placed_boxes.append(box)
+                add_cost_terms(box, placed_boxes, container, child_terms)
+                score = finalize_cost(placed_boxes, child_terms, container)
+                placed_boxes.truncate(len(loaded))
+                child_remaining = remaining[:type_idx] + (remaining[type_idx] - 1,) + remaining[type_idx + 1:]
+                children.append((score, placements + ((type_idx, orientation, box.x, box.y, box.z),), child_terms,
+                                 child_remaining))
+        return children
+
+    def rank(state):
+        return state[0], state[1]
+
+    widths = [beam_width]
+    while widths[-1] > 1:
+        widths.append(widths[-1] // 2)
+    root = (0.0, (), new_cost_terms(), tuple(len(indices) for _, indices in types))
+    beams = [[root] for _ in widths]
+    start_time = time.time()
+    for step in range(len(boxes)):
+        if should_stop(deadline, None, 0) and len(widths) > 1:
+            print(f"⏹️ Time budget reached at box {step}, completing the best partial layout")
+            beams, widths, branch_types = [[min((beam[0] for beam in beams if beam), key=rank)]], [1], 1
+
+        # Every partial layout held by any beam, expanded once
+        expanded = {}
+        for _, placements, terms, remaining in sorted({state[1]: state for beam in beams for state in beam}.values(),
+                                                      key=lambda state: state[1]):
+            expanded[placements] = expand(placements, terms, remaining, branch_types)
+        beams = [sorted((child for state in beam for child in expanded[state[1]]), key=rank)[:width]
+                 for width, beam in zip(widths, beams)]
+        if not any(beams):
+            print(f"❌ Beam search could not place box {step + 1} of {len(boxes)}")
+            break
+
+        if progress_callback:
+            best_score = min(beam[0][0] for beam in beams if beam)
+            progress_callback({
+                "iteration": step + 1, "temperature": None, "current_cost": best_score, "best_cost": best_score,
+                "progress": (step + 1) / len(boxes), "best_solution": None
+            })
+
+    finished = [beam[0] for beam in beams if beam]
+    best = min(finished, key=rank) if finished else None
+    greedy_solution, greedy_cost = greedy_pack(boxes, container, placement_mode, heightmap_resolution)
+    if best is None or best[0] >= 1e12 or greedy_cost <= best[0]:
+        if greedy_solution is None:
+            print("❌ Final result invalid. No feasible solution found.")
+        return greedy_solution, greedy_cost
+
+    # Hand out the actual boxes of every type in index order
+    score, placements, _, _ = best
+    available = [list(indices) for _, indices in types]
+    solution = []
+    for type_idx, orientation, x, y, z in placements:
+        box = boxes[available[type_idx].pop(0)].copy()
+        box.rotate(orientation)
+        box.x, box.y, box.z = x, y, z
+        solution.append(box)
+    print(f"✅ Beam search finished (width {beam_width}). Best cost: {score:.2f} in {time.time() - start_time:.2f}s")
+    return solution, score
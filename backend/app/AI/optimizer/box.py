@@ -1,36 +1,91 @@
+from functools import lru_cache
+
 # This file defines a Box class to represent a container. Each box has a unique ID, original dimensions, current dimensions, position, and a fragile flag.
 # The class also provides methods for rotating and copying the box. The box ID is auto-incremented to ensure uniqueness.
 # The design of this class allows users to create multiple box instances and perform operations such as rotation and duplication.
+# Boxes are created and copied thousands of times per optimization run, so the class uses __slots__ instead of a
+# per-instance __dict__, shares one orientation tuple between all boxes of the same size, and copies without __init__.
+# The orientation tuple only holds the distinct rotations the item's orientation constraint allows, so placement
+# tries a cube once instead of six times. Placement tries them starting at preferred_orientation, the box's rotation
+# gene in the search genome (see sa_optimizer.py), and wraps around until one fits.
+
+# Item.orientation -> indices into the 6 rotations below that keep the required side vertical (height is the y axis):
+# face up / face down keep the original height vertical, side A stands the box on its width, side B on its depth
+ORIENTATION_CONSTRAINTS = {
+    "face_up": (0, 5),
+    "face_down": (0, 5),
+    "side_a": (2, 4),
+    "side_b": (1, 3),
+}
+
+
+# "Face Up", "face_up", "Side A", ... -> key of ORIENTATION_CONSTRAINTS; None when the item may be rotated freely
+def normalize_orientation(orientation):
+    if not orientation:
+        return None
+    key = str(orientation).strip().lower().replace(" ", "_").replace("-", "_")
+    return key if key in ORIENTATION_CONSTRAINTS else None
+
+
+# The distinct axis-aligned rotations of a box allowed by the constraint, computed once per size and constraint
+@lru_cache(maxsize=None)
+def orientations_for(width, height, depth, constraint=None):
+    rotations = (
+        (width, height, depth),
+        (width, depth, height),
+        (height, width, depth),
+        (height, depth, width),
+        (depth, width, height),
+        (depth, height, width)
+    )
+    allowed = ORIENTATION_CONSTRAINTS[constraint] if constraint else range(len(rotations))
+    return tuple(dict.fromkeys(rotations[idx] for idx in allowed))  # Drops repeats, keeps the order
+
+
 class Box:
+    __slots__ = (
+        "item_id", "original_width", "original_height", "original_depth", "is_fragile",
+        "x", "y", "z", "width", "height", "depth", "unique_id", "orientation", "orientation_constraint",
+        "preferred_orientation"
+    )
     counter = 1
 
-    def __init__(self, item_id, original_width, original_height, original_depth, is_fragile=False):
+    # unique_id: explicit ID for reproducible runs; by default IDs come from the process-wide counter
+    # orientation_constraint: the item's orientation ("Face Up", "side_a", ...), None to allow every rotation
+    def __init__(self, item_id, original_width, original_height, original_depth, is_fragile=False, unique_id=None,
+                 orientation_constraint=None):
         self.item_id = int(item_id)
         self.original_width = float(original_width)
         self.original_height = float(original_height)
         self.original_depth = float(original_depth)
         self.is_fragile = bool(int(is_fragile))
         self.x = self.y = self.z = 0
-        self.width = self.original_width
-        self.height = self.original_height
-        self.depth = self.original_depth
-        self.unique_id = Box.counter
-        Box.counter += 1
-        self.orientation = [
-            (self.original_width, self.original_height, self.original_depth),
-            (self.original_width, self.original_depth, self.original_height),
-            (self.original_height, self.original_width, self.original_depth),
-            (self.original_height, self.original_depth, self.original_width),
-            (self.original_depth, self.original_width, self.original_height),
-            (self.original_depth, self.original_height, self.original_width)
-        ]
+        if unique_id is None:
+            unique_id = Box.counter
+            Box.counter += 1
+        self.unique_id = unique_id
+        self.orientation_constraint = normalize_orientation(orientation_constraint)
+        self.orientation = orientations_for(
+            self.original_width, self.original_height, self.original_depth, self.orientation_constraint
+        )
+        self.width, self.height, self.depth = self.orientation[0]  # The original dimensions unless the constraint forbids them
+        self.preferred_orientation = 0
 
     def rotate(self, idx):
         self.width, self.height, self.depth = self.orientation[idx]
 
+    # Copies share the orientation tuple and keep the unique ID, so they skip __init__ and the counter
     def copy(self):
-        new_box = Box(self.item_id, self.original_width, self.original_height, self.original_depth, self.is_fragile)
+        new_box = Box.__new__(Box)
+        new_box.item_id = self.item_id
+        new_box.original_width = self.original_width
+        new_box.original_height = self.original_height
+        new_box.original_depth = self.original_depth
+        new_box.is_fragile = self.is_fragile
         new_box.x, new_box.y, new_box.z = self.x, self.y, self.z
         new_box.width, new_box.height, new_box.depth = self.width, self.height, self.depth
         new_box.unique_id = self.unique_id
-        return new_box
\ No newline at end of file
+        new_box.orientation = self.orientation
+        new_box.orientation_constraint = self.orientation_constraint
+        new_box.preferred_orientation = self.preferred_orientation
+        return new_box
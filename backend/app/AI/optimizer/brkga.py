@@ -0,0 +1,176 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .cost_functions import IncrementalCostEvaluator, box_volume, placement_key
+from .greedy import greedy_genome
+from .heightmap import DEFAULT_RESOLUTION
+from .sa_optimizer import POOL_CONTEXT, cooling_progress, decode, genome_boxes, report_progress, should_stop
+from . import instrumentation
+
+# This file implements a biased random-key genetic algorithm (BRKGA). A chromosome is 2n keys in [0, 1): the first n
+# sort the boxes into a placement order, the last n pick each box's orientation. Chromosomes are decoded into the same
+# (order, rotations) genome simulated annealing uses and scored with the same placement rules and cost function, so
+# a box's orientation key picks the orientation its placement tries first.
+# Every generation the elite chromosomes survive unchanged, a few random mutants are added, and the rest are children
+# of one elite and one non-elite parent that take each key from the elite parent with probability ELITE_BIAS.
+# The new chromosomes of a generation are decoded as one batch, split across a process pool when workers > 1.
+# A batch is evaluated in the order of its volume-sorted placement keys, so consecutive chromosomes share long
+# placement prefixes that the IncrementalCostEvaluator does not re-place, and every pool worker keeps one evaluator
+# (with its fitness cache) for the whole run.
+
+POPULATION_SIZE = 40
+ELITE_FRACTION = 0.2
+MUTANT_FRACTION = 0.15
+ELITE_BIAS = 0.7
+GENERATIONS = 60
+
+
+# Random keys -> genome (order, rotations)
+def decode_keys(keys, boxes):
+    n = len(boxes)
+    order = sorted(range(n), key=lambda idx: keys[idx])
+    rotations = [min(int(keys[n + idx] * len(box.orientation)), len(box.orientation) - 1) for idx, box in enumerate(boxes)]
+    return order, rotations
+
+
+# Keys that decode to the first-fit decreasing genome, so the population starts no worse than the greedy layout
+def greedy_keys(boxes):
+    order, _ = greedy_genome(boxes)
+    keys = [0.0] * (2 * len(boxes))
+    for position, box_idx in enumerate(order):
+        keys[box_idx] = position / len(boxes)
+    return keys
+
+
+# The sequence the cost depends on (see IncrementalCostEvaluator): every box's placement key and rotation gene, in
+# placement order; batches are sorted by it
+def canonical_keys(boxes, order, rotations):
+    ranked = sorted(order, key=lambda idx: box_volume(boxes[idx]), reverse=True)
+    return [(placement_key(boxes[idx]), rotations[idx]) for idx in ranked]
+
+
+# Evaluation state of one run: (scratch boxes, evaluator)
+def new_batch_state(boxes, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    return [b.copy() for b in boxes], IncrementalCostEvaluator(container, placement_mode,
+                                                               heightmap_resolution=heightmap_resolution)
+
+
+# Pool workers build their state once per run, in the pool initializer
+worker_batch_state = None
+
+def init_batch_worker(boxes, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    global worker_batch_state
+    worker_batch_state = new_batch_state(boxes, container, placement_mode, heightmap_resolution)
+
+
+# Cost of every genome in the batch. Module-level so a process pool can run it; pool workers use the state of
+# init_batch_worker, in-process callers pass their own. Genomes left when the deadline passes get an infinite cost.
+# With collect_stats the counters of a pool worker come back as the second element.
+def evaluate_batch(genomes, deadline=None, collect_stats=False, state=None):
+    worker_stats = instrumentation.start_worker_stats(collect_stats)
+    work_boxes, evaluator = state or worker_batch_state
+
+    costs = []
+    for order, rotations in genomes:
+        if should_stop(deadline, None, 0):
+            costs.append(float("inf"))
+            continue
+        costs.append(evaluator.evaluate(genome_boxes(work_boxes, order, rotations)))
+    return costs, instrumentation.snapshot() if worker_stats else None
+
+
+# deadline and patience (counted in decoded chromosomes, like annealing iterations) stop it early.
+# After every generation progress_callback (if given) receives a progress event, see report_progress.
+# seed drives every random key, so results do not depend on the number of workers.
+def brkga(boxes, container, population_size=POPULATION_SIZE, generations=GENERATIONS, elite_fraction=ELITE_FRACTION,
+          mutant_fraction=MUTANT_FRACTION, elite_bias=ELITE_BIAS, workers=None, placement_mode="contact", deadline=None,
+          patience=None, progress_callback=None, collect_stats=False, seed=None, heightmap_resolution=DEFAULT_RESOLUTION):
+    rng = random.Random(seed)
+    n = len(boxes)
+    population_size = max(4, population_size)
+    elites = max(1, int(population_size * elite_fraction))
+    mutants = max(1, int(population_size * mutant_fraction))
+
+    workers = max(1, min(workers or os.cpu_count() or 1, population_size))
+    state = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=POOL_CONTEXT, initializer=init_batch_worker,
+            initargs=(boxes, container, placement_mode, heightmap_resolution)
+        )
+    else:
+        pool = None
+        state = new_batch_state(boxes, container, placement_mode, heightmap_resolution)
+
+    def random_keys():
+        return [rng.random() for _ in range(2 * n)]
+
+    # Decode and score a batch of chromosomes; the pool gets one contiguous chunk of the sorted batch per worker
+    def evaluate(chromosomes):
+        genomes = [decode_keys(keys, boxes) for keys in chromosomes]
+        ranked = sorted(range(len(genomes)), key=lambda k: canonical_keys(boxes, *genomes[k]))
+        genomes = [genomes[k] for k in ranked]
+        if pool is None:
+            sorted_costs, _ = evaluate_batch(genomes, deadline, state=state)
+        else:
+            size = math.ceil(len(genomes) / workers)
+            chunks = [genomes[start:start + size] for start in range(0, len(genomes), size)]
+            sorted_costs = []
+            for chunk_costs, stats in pool.map(
+                evaluate_batch, chunks, [deadline] * len(chunks), [collect_stats] * len(chunks)
+            ):
+                instrumentation.merge(stats)
+                sorted_costs.extend(chunk_costs)
+        costs = [None] * len(genomes)
+        for k, cost in zip(ranked, sorted_costs):
+            costs[k] = cost
+        return costs
+
+    stale_iterations = 0
+    start_time = time.time()
+    reported_best = None
+
+    try:
+        chromosomes = [greedy_keys(boxes)] + [random_keys() for _ in range(population_size - 1)]
+        population = sorted(zip(evaluate(chromosomes), chromosomes), key=lambda member: member[0])
+        best_cost, best_keys = population[0]
+
+        for generation in range(generations):
+            if should_stop(deadline, patience, stale_iterations):
+                print(f"⏹️ Stopping early at generation {generation} ({stale_iterations} evaluations without improvement)")
+                break
+
+            elite, rest = population[:elites], population[elites:]
+            children = [random_keys() for _ in range(mutants)]
+            for _ in range(population_size - elites - mutants):
+                elite_keys, other_keys = rng.choice(elite)[1], rng.choice(rest)[1]
+                children.append([e if rng.random() < elite_bias else o for e, o in zip(elite_keys, other_keys)])
+
+            # Stable sort: on equal cost the elites stay ahead of the new chromosomes
+            population = sorted(elite + list(zip(evaluate(children), children)), key=lambda member: member[0])
+            instrumentation.count("brkga_generations")
+            stale_iterations += len(children)
+            if population[0][0] < best_cost:
+                best_cost, best_keys = population[0]
+                stale_iterations = 0
+
+            if progress_callback:
+                reported_best = report_progress(
+                    progress_callback, boxes, container, placement_mode, heightmap_resolution, decode_keys(best_keys, boxes),
+                    reported_best,
+                    iteration=generation + 1, temperature=None, current_cost=population[0][0], best_cost=best_cost,
+                    progress=cooling_progress(generation + 1, generations, start_time, deadline, stale_iterations, patience)
+                )
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if best_cost >= 1e12:
+        print("❌ Final result invalid. No feasible solution found.")
+        return None, float("inf")
+
+    best_solution, _ = decode(boxes, *decode_keys(best_keys, boxes), container, placement_mode, heightmap_resolution)
+    print(f"✅ BRKGA finished. Best cost: {best_cost:.2f}")
+    return best_solution, best_cost
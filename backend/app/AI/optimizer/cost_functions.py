@@ -1,5 +1,13 @@
 import math
+from collections import OrderedDict
 import numpy as np
+from .placement import PlacedBoxes, covered_ratio, nearby
+from .heightmap import DEFAULT_RESOLUTION, HeightMap
+from .instrumentation import count, phase
+
+# Scalar replacement for np.isclose(a, b, atol=atol), which is much slower on plain floats
+def isclose(a, b, atol=1e-3, rtol=1e-5):
+    return abs(a - b) <= atol + rtol * abs(b)
 
 # Check if two boxes overlap
 def overlap(box1, box2):
@@ -33,7 +41,12 @@ def overlap_on_xy(b1, b2):
     )
 
 def is_gap_too_large(box, placed_boxes, threshold=1.5):
-    for other in placed_boxes:
+    if isinstance(placed_boxes, PlacedBoxes):
+        box_id = placed_boxes.index_of(box)
+        if box_id is not None:
+            return placed_boxes.gap_too_large(box_id, threshold)
+
+    for other in nearby(placed_boxes, box, threshold):
         if box == other:
             continue
         if overlap_on_yz(box, other):
@@ -50,37 +63,17 @@ def is_gap_too_large(box, placed_boxes, threshold=1.5):
                 return False
     return True
 
-def support_area_ratio(box, placed_boxes, step=None):
-    # Automatically calculate suitable step size
-    if step is None:
-        step = max(min(box.width, box.height, box.depth) / 6.0, 0.05)
-
-    supported = 0
-    total = 0
-    x_steps = max(1, int(box.width / step))
-    z_steps = max(1, int(box.depth / step))
-
-    for i in range(x_steps):
-        for k in range(z_steps):
-            px = box.x + i * step + step / 2
-            pz = box.z + k * step + step / 2
-            py = box.y
-
-            is_supported = False
-            if np.isclose(py, 0.0, atol=1e-3):  # Ground contact counts as support
-                is_supported = True
-            else:
-                for other in placed_boxes:
-                    if (np.isclose(other.y + other.height, py, atol=1e-3) and
-                        other.x <= px <= other.x + other.width and
-                        other.z <= pz <= other.z + other.depth):
-                        is_supported = True
-                        break
-
-            supported += int(is_supported)
-            total += 1
-
-    return supported / total if total > 0 else 0
+# Exact fraction of the base of the box resting on the floor or on boxes whose top face is at its base height
+def support_area_ratio(box, placed_boxes):
+    count("support_checks")
+    if isinstance(placed_boxes, PlacedBoxes):
+        return placed_boxes.support_ratio((box.x, box.y, box.z), (box.width, box.height, box.depth))
+
+    if isclose(box.y, 0.0, atol=1e-3):  # Ground contact counts as support
+        return 1.0
+    faces = np.array([(other.x, other.z, other.x + other.width, other.z + other.depth)
+                      for other in placed_boxes if isclose(other.y + other.height, box.y, atol=1e-3)]).reshape(-1, 4)
+    return covered_ratio(box.x, box.z, box.x + box.width, box.z + box.depth, faces)
 
 def is_touching(box, others):
     # Against container wall
@@ -99,7 +92,11 @@ def is_touching(box, others):
 
 # Check if the box is placed above any fragile box
 def is_on_top_of_fragile(box, placed_boxes):
-    for other in placed_boxes:
+    if isinstance(placed_boxes, PlacedBoxes):
+        positions = np.array([(box.x, box.y, box.z)])
+        return bool(placed_boxes.fragile_below_mask(positions, np.array([box.width, box.height, box.depth]))[0])
+
+    for other in nearby(placed_boxes, box, unbounded=('z',)):
         if other.is_fragile:
             if (
                 overlap_on_xy(box, other) and
@@ -115,109 +112,99 @@ def box_fits_in_container(box, container, eps=1e-6):
         box.depth <= container['depth'] + eps
     )
 
+# Yield the indices of the candidate positions that pass every placement check, in candidate order.
+# Candidates are tested in chunks so the greedy caller can stop at the first valid one without
+# vectorizing the whole (possibly cubic) candidate set.
+CANDIDATE_CHUNK = 64
+
+def valid_positions(placed_boxes, positions, dims, container, check_bounds=True, check_fragile=True, check_support=True):
+    eps = 1e-6
+    limits = np.array([container['width'], container['height'], container['depth']]) + eps
+    for offset in range(0, len(positions), CANDIDATE_CHUNK):
+        chunk = positions[offset:offset + CANDIDATE_CHUNK]
+        count("candidates_tested", len(chunk))
+        ok = np.ones(len(chunk), dtype=bool)
+        if check_fragile:
+            ok &= ~placed_boxes.fragile_below_mask(chunk, dims)
+        if check_bounds:
+            ok &= ~np.any(chunk + dims > limits, axis=1)  # ❌ Out of bounds, skip this position
+        if ok.any():
+            count("overlap_checks", int(ok.sum()))
+            ok[ok] = ~placed_boxes.overlap_mask(chunk[ok], dims)
+        for idx in np.flatnonzero(ok):
+            position = chunk[idx]
+            if check_support and position[1] > 0:
+                count("support_checks")
+                if not placed_boxes.fully_supported(position, dims):
+                    continue
+            yield offset + idx
+
 def try_place_with_contact_priority(box, placed_boxes, container, greedy=False, bias_to_corner=False):
     if not box_fits_in_container(box, container):
         return False
-    eps = 1e-6
+    if not isinstance(placed_boxes, PlacedBoxes):
+        placed_boxes = PlacedBoxes(container, placed_boxes)
+    dims = np.array([box.width, box.height, box.depth])
     best_score = float('inf')
     best_position = None
 
-    def get_candidates(placed_boxes, axis_len, dim, bias_corner=False):
-        candidates = set()
-        if bias_corner:
-            candidates.add(0.0)
-        for b in placed_boxes:
-            end = getattr(b, dim) + getattr(b, 'width' if dim == 'x' else 'height' if dim == 'y' else 'depth')
-            if end < axis_len:
-                candidates.add(round(end, 6))
-                candidates.add(round(end + 0.01, 6))
-                candidates.add(round(end - 0.01, 6))
-        return sorted(candidates)
-
-    # Step 0: Initial corner
-    corner_positions = [(0.0, 0.0, 0.0)]
-    for (x, y, z) in corner_positions:
-        box.x, box.y, box.z = x, y, z
-        if is_on_top_of_fragile(box, placed_boxes):
-            continue
-        if (box.x + box.width > container['width'] + eps or
-            box.y + box.height > container['height'] + eps or
-            box.z + box.depth > container['depth'] + eps):
-            continue  # ❌ Out of bounds, skip this position
-        if any(overlap(box, other) for other in placed_boxes):
-            continue
-        if greedy:
-            return True
-        else:
+    # Test a batch of positions; in greedy mode take the first valid one, otherwise keep the lowest x + y + z
+    def search(positions, **checks):
+        nonlocal best_score, best_position
+        for idx in valid_positions(placed_boxes, positions, dims, container, **checks):
+            x, y, z = (float(v) for v in positions[idx])
+            if greedy:
+                best_position = (x, y, z)
+                return True
             score = x + y + z
             if score < best_score:
                 best_score = score
                 best_position = (x, y, z)
+        return False
+
+    # Step 0: Initial corner
+    corner_positions = np.array([(0.0, 0.0, 0.0)])
+    with phase("place.corner"):
+        found = search(corner_positions, check_support=False)
+    if found:
+        box.x, box.y, box.z = best_position
+        return True
 
     # Step 1: Expand from existing boxes
-    for anchor in placed_boxes:
-        offsets = [
-            (anchor.x + anchor.width, anchor.y, anchor.z),
-            (anchor.x, anchor.y + anchor.height, anchor.z),
-            (anchor.x, anchor.y, anchor.z + anchor.depth),
-        ]
-        for (x, y, z) in offsets:
-            box.x, box.y, box.z = x, y, z
-            if is_on_top_of_fragile(box, placed_boxes):
-                continue
-            if (box.x + box.width > container['width'] + eps or
-                box.y + box.height > container['height'] + eps or
-                box.z + box.depth > container['depth'] + eps):
-                continue  # ❌ Out of bounds, skip this position
-            if any(overlap(box, other) for other in placed_boxes):
-                continue
-            if y > 0 and support_area_ratio(box, placed_boxes) < 1.0:
-                continue
-            if greedy:
-                return True
-            else:
-                score = x + y + z
-                if score < best_score:
-                    best_score = score
-                    best_position = (x, y, z)
-
-    # Step 2: Exhaustive y-x-z search
-    y_range = sorted(set([0.0] + [b.y + b.height for b in placed_boxes]))
-    x_range = get_candidates(placed_boxes, container['width'], 'x', bias_to_corner)
-    z_range = get_candidates(placed_boxes, container['depth'], 'z', bias_to_corner)
-
-    for y in y_range:
-        for z in z_range:
-            for x in x_range:
-                box.x, box.y, box.z = x, y, z
-                if is_on_top_of_fragile(box, placed_boxes):
-                    continue
-                if any(overlap(box, other) for other in placed_boxes):
-                    continue
-                if y > 0 and support_area_ratio(box, placed_boxes) < 1.0:
-                    continue
-                if greedy:
-                    return True
-                else:
-                    score = x + y + z
-                    if score < best_score:
-                        best_score = score
-                        best_position = (x, y, z)
+    n = len(placed_boxes)
+    if n:
+        start, end = placed_boxes.start[:n], placed_boxes.end[:n]
+        anchor_positions = np.empty((n, 3, 3))
+        anchor_positions[:] = start[:, None, :]
+        anchor_positions[:, 0, 0] = end[:, 0]   # (anchor.x + anchor.width, anchor.y, anchor.z)
+        anchor_positions[:, 1, 1] = end[:, 1]   # (anchor.x, anchor.y + anchor.height, anchor.z)
+        anchor_positions[:, 2, 2] = end[:, 2]   # (anchor.x, anchor.y, anchor.z + anchor.depth)
+        with phase("place.anchors"):
+            found = search(anchor_positions.reshape(-1, 3))
+        if found:
+            box.x, box.y, box.z = best_position
+            return True
+
+    # Step 2: Extreme points of the current layout (bias_to_corner also tries them pushed against the x = 0 and z = 0 walls)
+    with phase("place.extreme_points"):
+        extreme_positions = placed_boxes.extreme_point_array()
+        if bias_to_corner and len(extreme_positions):
+            against_x = extreme_positions.copy()
+            against_x[:, 0] = 0.0
+            against_z = extreme_positions.copy()
+            against_z[:, 2] = 0.0
+            extreme_positions = np.concatenate([extreme_positions, against_x, against_z])
+        found = search(extreme_positions)
+    if found:
+        box.x, box.y, box.z = best_position
+        return True
 
     # Step 3: fallback to ground corner
-    for x in [0.0]:
-        for y in [0.0]:
-            for z in [0.0]:
-                box.x, box.y, box.z = x, y, z
-                if any(overlap(box, other) for other in placed_boxes):
-                    continue
-                if greedy:
-                    return True
-                else:
-                    score = x + y + z
-                    if score < best_score:
-                        best_score = score
-                        best_position = (x, y, z)
+    with phase("place.fallback"):
+        found = search(corner_positions, check_bounds=False, check_fragile=False, check_support=False)
+    if found:
+        box.x, box.y, box.z = best_position
+        return True
 
     if best_position:
         box.x, box.y, box.z = best_position
@@ -227,6 +214,40 @@ def try_place_with_contact_priority(box, placed_boxes, container, greedy=False,
     return False
 
 
+# Height-map placement: rest the box at the lowest fully supported spot of the load's top surface
+def try_place_on_heightmap(box, placed_boxes, container):
+    if not box_fits_in_container(box, container):
+        return False
+    count("candidates_tested", placed_boxes.heightmap.nx * placed_boxes.heightmap.nz)
+    dims = (box.width, box.height, box.depth)
+
+    # The height map rounds footprints to whole cells, so its flat spots can overhang; keep only fully supported ones
+    def supported(position):
+        count("support_checks")
+        return placed_boxes.fully_supported(position, dims)
+
+    with phase("place.heightmap"):
+        position = placed_boxes.heightmap.find_position(*dims, supported=supported)
+    if position is None:
+        return False
+    box.x, box.y, box.z = position
+    return True
+
+
+# "contact": try_place_with_contact_priority, "heightmap": try_place_on_heightmap
+PLACEMENT_MODES = ("contact", "heightmap")
+
+def check_placement_mode(placement_mode):
+    if placement_mode not in PLACEMENT_MODES:
+        raise ValueError(f"Unknown placement mode '{placement_mode}', expected one of {PLACEMENT_MODES}")
+
+# heightmap_resolution: cell size in meters of the height map used in placement mode "heightmap"
+def new_placed_boxes(container, placement_mode="contact", boxes=(), heightmap_resolution=DEFAULT_RESOLUTION):
+    check_placement_mode(placement_mode)
+    heightmap = HeightMap(container, heightmap_resolution) if placement_mode == "heightmap" else None
+    return PlacedBoxes(container, boxes, heightmap=heightmap)
+
+
 # Check if the box is smaller than a given volume
 def is_small_box(box, threshold_volume=10):
     return box.width * box.height * box.depth < threshold_volume
@@ -240,68 +261,91 @@ def is_on_edge(box, container, margin=1.0):
             box.y + box.height >= container['height'] - margin or
             box.z + box.depth >= container['depth'] - margin)
 
-# Compute the cost function
-def advanced_cost_function(order, container):
-    order = sorted(order, key=lambda b: b.width * b.height * b.depth, reverse=True)
-
-    placed_boxes = []
-    total_volume = 0
-    total_x = total_y = total_z = 0
-    fragile_penalty = 0
-    edge_penalty = 0
-    base_bias_penalty = 0
-    slope_penalty_total = 0
-    max_z = 0
-    position_bonus = 0
+# Volume used to sort boxes before placement (largest first); taken from the original dimensions so it does not
+# depend on the box's current rotation
+def box_volume(box):
+    return box.original_width * box.original_height * box.original_depth
+
+# Everything about a box that influences where it ends up: its allowed rotations, the one tried first, and its fragile flag
+def placement_key(box):
+    return (box.original_width, box.original_height, box.original_depth, box.is_fragile, box.orientation_constraint or "",
+            box.preferred_orientation)
+
+# Running totals of the per-box cost terms
+def new_cost_terms():
+    return {
+        "total_volume": 0,
+        "total_x": 0,
+        "total_y": 0,
+        "total_z": 0,
+        "fragile_penalty": 0,
+        "edge_penalty": 0,
+        "base_bias_penalty": 0,
+        "slope_penalty_total": 0,
+        "max_z": 0,
+        "position_bonus": 0,
+    }
+
+# Place one box (trying each of its distinct allowed orientations) and add its contribution to the cost terms
+def place_and_score(box, placed_boxes, container, terms):
+    heightmap_mode = getattr(placed_boxes, 'heightmap', None) is not None
+    orientations = len(box.orientation)
+    for attempt in range(orientations):
+        box.rotate((box.preferred_orientation + attempt) % orientations)
+        count("orientation_attempts")
+        if heightmap_mode:
+            placed = try_place_on_heightmap(box, placed_boxes, container)
+        else:
+            placed = try_place_with_contact_priority(box, placed_boxes, container, greedy=True)  # ✅ Enable greedy
+        if placed:
+            placed_boxes.append(box)
+            count("boxes_placed")
+            with phase("cost_terms"):
+                add_cost_terms(box, placed_boxes, container, terms)
+            return True
 
-    for box in order:
-        placed = False
-        for orientation in range(6):
-            box.rotate(orientation)
-            if try_place_with_contact_priority(box, placed_boxes, container, greedy=True):  # ✅ Enable greedy
-                placed_boxes.append(box)
-                total_volume += box.width * box.height * box.depth
-                total_x += box.x + box.width / 2
-                total_y += box.y + box.height / 2
-                total_z += box.z + box.depth / 2
-                max_z = max(max_z, box.z + box.depth)
-
-                # Slope penalty (higher is worse)
-                slope_penalty_total += max(0, box.y - 0.5 * (box.x + box.z))
-
-                # Fragile box penalty (no heavy box above)
-                if box.is_fragile:
-                    top = box.y + box.height
-                    for other in placed_boxes:
-                        if other == box:
-                            continue
-                        if overlap_on_xy(box, other) and other.y >= top - 1e-3:
-                            fragile_penalty += 1e6
-                            break
-
-                # Small box on edge penalty
-                if is_small_box(box) and is_on_edge(box, container):
-                    edge_penalty += 1e6
-
-                # Gap penalty
-                if is_gap_too_large(box, placed_boxes):
-                    base_bias_penalty += 10
-                else:
-                    base_bias_penalty -= 5
-
-                # Bonus for being near origin and touching wall
-                center_dist = math.sqrt(box.x**2 + box.y**2 + box.z**2)
-                position_bonus -= center_dist * 0.5
-                if np.isclose(box.x, 0.0, atol=1e-3): position_bonus += 1.0
-                if np.isclose(box.y, 0.0, atol=1e-3): position_bonus += 1.0
-                if np.isclose(box.z, 0.0, atol=1e-3): position_bonus += 1.0
-
-                placed = True
-                break
+    return False
 
-        if not placed:
-            return 1e12  # Heavy penalty if box cannot be placed
+# Add one placed box's contribution to the running cost terms
+def add_cost_terms(box, placed_boxes, container, terms):
+    terms["total_volume"] += box.width * box.height * box.depth
+    terms["total_x"] += box.x + box.width / 2
+    terms["total_y"] += box.y + box.height / 2
+    terms["total_z"] += box.z + box.depth / 2
+    terms["max_z"] = max(terms["max_z"], box.z + box.depth)
+
+    # Slope penalty (higher is worse)
+    terms["slope_penalty_total"] += max(0, box.y - 0.5 * (box.x + box.z))
+
+    # Fragile box penalty (no heavy box above)
+    if box.is_fragile:
+        top = box.y + box.height
+        for other in nearby(placed_boxes, box, unbounded=('z',)):
+            if other == box:
+                continue
+            if overlap_on_xy(box, other) and other.y >= top - 1e-3:
+                terms["fragile_penalty"] += 1e6
+                break
 
+    # Small box on edge penalty
+    if is_small_box(box) and is_on_edge(box, container):
+        terms["edge_penalty"] += 1e6
+
+    # Gap penalty
+    if is_gap_too_large(box, placed_boxes):
+        terms["base_bias_penalty"] += 10
+    else:
+        terms["base_bias_penalty"] -= 5
+
+    # Bonus for being near origin and touching wall
+    center_dist = math.sqrt(box.x**2 + box.y**2 + box.z**2)
+    terms["position_bonus"] -= center_dist * 0.5
+    if isclose(box.x, 0.0, atol=1e-3): terms["position_bonus"] += 1.0
+    if isclose(box.y, 0.0, atol=1e-3): terms["position_bonus"] += 1.0
+    if isclose(box.z, 0.0, atol=1e-3): terms["position_bonus"] += 1.0
+
+# Combine the per-box terms with the whole-layout terms into the final cost
+def finalize_cost(placed_boxes, terms, container):
     if not placed_boxes:
         return 1e12
 
@@ -309,42 +353,152 @@ def advanced_cost_function(order, container):
     center_x = container['width'] / 2
     center_y = container['height'] / 2
     center_z = container['depth'] / 2
-    avg_x = total_x / len(placed_boxes)
-    avg_y = total_y / len(placed_boxes)
-    avg_z = total_z / len(placed_boxes)
+    avg_x = terms["total_x"] / len(placed_boxes)
+    avg_y = terms["total_y"] / len(placed_boxes)
+    avg_z = terms["total_z"] / len(placed_boxes)
     center_penalty = math.sqrt((avg_x - center_x)**2 + (avg_y - center_y)**2 + (avg_z - center_z)**2)
 
     # Unused volume penalty
     container_volume = container['width'] * container['height'] * container['depth']
-    unused_volume = container_volume - total_volume
+    unused_volume = container_volume - terms["total_volume"]
     volume_penalty = unused_volume / container_volume
 
     # Height penalty
-    height_penalty = max_z / container['depth']
-
-    # Touching bonus
-    touching_bonus = 0
-    for i, box in enumerate(placed_boxes):
-        for j, other in enumerate(placed_boxes):
-            if i != j and is_touching(box, [other]):
-                touching_bonus += 1
+    height_penalty = terms["max_z"] / container['depth']
 
-    placed_boxes.sort(key=lambda b: (b.y, b.z, b.x))
+    # Touching bonus (face contacts are recorded by PlacedBoxes as boxes are placed)
+    touching_bonus = placed_boxes.touching_bonus()
 
     final_cost = (
-        base_bias_penalty * 1.0 +
-        slope_penalty_total * 2.0 +
+        terms["base_bias_penalty"] * 1.0 +
+        terms["slope_penalty_total"] * 2.0 +
         touching_bonus +
-        5.0 * fragile_penalty +
-        1.0 * edge_penalty +
+        5.0 * terms["fragile_penalty"] +
+        1.0 * terms["edge_penalty"] +
         2.0 * volume_penalty +
         3.0 * height_penalty +
         center_penalty +
-        position_bonus
+        terms["position_bonus"]
     )
 
     # Fallback in case of NaN or negative cost due to logic error
-    if not np.isfinite(final_cost) or final_cost < 0:
+    if not math.isfinite(final_cost) or final_cost < 0:
         return 1e12
 
-    return final_cost
\ No newline at end of file
+    return final_cost
+
+# Compute the cost function
+def advanced_cost_function(order, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    count("evaluations")
+    with phase("evaluate"):
+        return pack_and_cost(order, container, placement_mode, heightmap_resolution)
+
+def pack_and_cost(order, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    order = sorted(order, key=box_volume, reverse=True)
+
+    placed_boxes = new_placed_boxes(container, placement_mode, heightmap_resolution=heightmap_resolution)
+    terms = new_cost_terms()
+
+    for box in order:
+        if not place_and_score(box, placed_boxes, container, terms):
+            return 1e12  # Heavy penalty if box cannot be placed
+
+    with phase("cost_terms"):
+        return finalize_cost(placed_boxes, terms, container)
+
+
+# Same result as advanced_cost_function, but remembers the layout of the last evaluated order.
+# A box's placement only depends on the boxes placed before it, so the common prefix with the
+# previous order is restored from the cache and only the boxes after the first change are re-placed.
+# The placed-box state is kept between calls and truncated back to the shared prefix instead of being rebuilt.
+#
+# In front of that sits a bounded LRU cache of finished evaluations. The cost only depends on the sequence of
+# placement keys after the volume sort (placement tries every orientation, so the boxes' rotations do not matter),
+# which makes that sequence the canonical cache key: swapping two identical items, re-rotating a box, or a move
+# that the volume sort undoes all map to a state that was already packed, and cost a dictionary lookup.
+FITNESS_CACHE_SIZE = 4096
+
+class IncrementalCostEvaluator:
+    def __init__(self, container, placement_mode="contact", cache_size=FITNESS_CACHE_SIZE,
+                 heightmap_resolution=DEFAULT_RESOLUTION):
+        check_placement_mode(placement_mode)
+        self.container = container
+        self.placement_mode = placement_mode
+        self.keys = []      # placement_key of every position in the last evaluated order
+        self.layouts = []   # (x, y, z, width, height, depth) of every placed position
+        self.terms = []     # snapshot of the cost terms after every placed position
+        self.placed_boxes = new_placed_boxes(container, placement_mode, heightmap_resolution=heightmap_resolution)
+        self.cache = OrderedDict()  # tuple of placement keys -> (cost, layouts or None if infeasible)
+        self.cache_size = cache_size
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.boxes_placed = 0
+        self.boxes_reused = 0
+
+    def hit_rate(self):
+        return self.cache_hits / self.evaluations if self.evaluations else 0.0
+
+    def common_prefix(self, keys):
+        limit = min(len(keys), len(self.keys))
+        prefix = 0
+        while prefix < limit and keys[prefix] == self.keys[prefix]:
+            prefix += 1
+        return prefix
+
+    def evaluate(self, order):
+        count("evaluations")
+        with phase("evaluate"):
+            return self.evaluate_cached(order)
+
+    def evaluate_cached(self, order):
+        self.evaluations += 1
+        order = sorted(order, key=box_volume, reverse=True)
+        keys = [placement_key(box) for box in order]
+
+        cache_key = tuple(keys)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.cache_hits += 1
+            count("cache_hits")
+            self.cache.move_to_end(cache_key)
+            cost, layouts = cached
+            if layouts is not None:
+                for box, layout in zip(order, layouts):
+                    box.x, box.y, box.z, box.width, box.height, box.depth = layout
+            return cost
+
+        cost = self.pack(order, keys)
+        self.cache[cache_key] = (cost, tuple(self.layouts) if cost < 1e12 else None)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return cost
+
+    def pack(self, order, keys):
+        prefix = self.common_prefix(keys)
+        restored = min(prefix, len(self.layouts))
+        for box, layout in zip(order, self.layouts[:restored]):
+            box.x, box.y, box.z, box.width, box.height, box.depth = layout
+        self.boxes_reused += restored
+
+        self.keys = keys
+        del self.layouts[restored:]
+        del self.terms[restored:]
+        placed_boxes = self.placed_boxes
+        placed_boxes.truncate(restored)
+        placed_boxes.boxes[:] = order[:restored]  # Same geometry, but this order's Box objects
+
+        # The previous order already failed inside the shared prefix
+        if restored < prefix:
+            return 1e12
+
+        terms = dict(self.terms[-1]) if self.terms else new_cost_terms()
+
+        for box in order[restored:]:
+            self.boxes_placed += 1
+            if not place_and_score(box, placed_boxes, self.container, terms):
+                return 1e12  # Heavy penalty if box cannot be placed
+            self.layouts.append((box.x, box.y, box.z, box.width, box.height, box.depth))
+            self.terms.append(dict(terms))
+
+        with phase("cost_terms"):
+            return finalize_cost(placed_boxes, terms, self.container)
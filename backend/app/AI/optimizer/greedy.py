@@ -0,0 +1,37 @@
+import math
+from .cost_functions import box_volume
+from .heightmap import DEFAULT_RESOLUTION
+from .sa_optimizer import decode
+
+# This file builds a layout in one constructive pass, for callers that need an answer in milliseconds rather than
+# the best answer: first-fit decreasing. Boxes go in largest volume first, each one in the first of its orientations
+# that fits, at the first free position (corner, anchors, then extreme points; in heightmap mode the lowest supported
+# spot). That pass is exactly how the search decodes a genome, so greedy and searched costs are directly comparable,
+# and the greedy layout is a natural starting point for simulated annealing (mode "refine" in ai.py).
+
+
+# Genome (order, rotations) of the first-fit decreasing layout
+def greedy_genome(boxes):
+    order = sorted(range(len(boxes)), key=lambda idx: box_volume(boxes[idx]), reverse=True)
+    return order, [0] * len(boxes)
+
+
+# The greedy genome with every box's rotation gene set to the orientation the greedy pass actually placed it in.
+# It decodes to the same layout (each box tries that orientation first, and it fit there), but the search's rotate
+# moves then start from the orientations in use instead of from the first allowed one of every box.
+def greedy_layout_genome(boxes, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    order, rotations = greedy_genome(boxes)
+    solution, _ = decode(boxes, order, rotations, container, placement_mode, heightmap_resolution)
+    for box_idx, box in zip(order, solution):
+        rotations[box_idx] = box.orientation.index((box.width, box.height, box.depth))
+    return order, rotations
+
+
+# Returns (solution, cost) like simulated_annealing: positioned Box copies, or (None, inf) if a box does not fit
+def greedy_pack(boxes, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    solution, cost = decode(boxes, *greedy_genome(boxes), container, placement_mode, heightmap_resolution)
+    if cost >= 1e12:
+        print("❌ Greedy pass could not place every box")
+        return None, math.inf
+    print(f"✅ Greedy pass finished. Cost: {cost:.2f}")
+    return solution, cost
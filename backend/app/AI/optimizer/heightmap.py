@@ -0,0 +1,100 @@
+import math
+import numpy as np
+
+# This file defines HeightMap, a 2D grid over the container floor (x = width, z = depth) that stores the height (y)
+# of the load's top surface in every cell, and whether that surface belongs to a fragile box.
+# It answers "where can this box rest, and is it fully supported there" for every floor position at once with
+# sliding-window array reductions, instead of testing the box against the placed boxes one by one.
+# A box covers every cell its footprint touches, so cells along its far edges are only partly under it; the grid is
+# exact for collisions (no box is ever placed into another) but too coarse to prove support. The flat spots it finds
+# are therefore only candidates, and the caller confirms each one with the exact support test (see find_position).
+
+DEFAULT_RESOLUTION = 0.02  # Cell size in meters
+HEIGHT_TOLERANCE = 1e-6
+
+
+# Reduce every run of `size` consecutive rows (axis 0) with `op` in O(rows * log(size)):
+# first combine power-of-two spans, then cover each window with two overlapping spans
+def sliding_reduce(values, size, op):
+    table, span = values, 1
+    while span * 2 <= size:
+        table = op(table[:-span], table[span:])
+        span *= 2
+    count = len(values) - size + 1
+    return op(table[:count], table[size - span:size - span + count])
+
+
+# Max / min over every cells_x by cells_z window of a 2D array
+def window_max(values, cells_x, cells_z):
+    values = sliding_reduce(values, cells_x, np.maximum)
+    return sliding_reduce(values.T, cells_z, np.maximum).T
+
+
+def window_min(values, cells_x, cells_z):
+    values = sliding_reduce(values, cells_x, np.minimum)
+    return sliding_reduce(values.T, cells_z, np.minimum).T
+
+
+class HeightMap:
+    def __init__(self, container, resolution=DEFAULT_RESOLUTION):
+        self.container = container
+        self.resolution = resolution
+        self.nx = max(1, math.ceil(container['width'] / resolution - 1e-9))
+        self.nz = max(1, math.ceil(container['depth'] / resolution - 1e-9))
+        self.heights = np.zeros((self.nx, self.nz))
+        self.fragile_top = np.zeros((self.nx, self.nz), dtype=bool)
+        self.frontier = -1  # Last depth column with anything on it; everything behind it is empty floor
+
+    # Number of cells needed to cover a length
+    def cells(self, length):
+        return max(1, math.ceil(length / self.resolution - 1e-9))
+
+    def footprint(self, x, z, width, depth):
+        i = math.floor(x / self.resolution + 1e-9)
+        j = math.floor(z / self.resolution + 1e-9)
+        return slice(i, min(i + self.cells(width), self.nx)), slice(j, min(j + self.cells(depth), self.nz))
+
+    # Returns an undo record for restore()
+    def add(self, box):
+        rows, cols = self.footprint(box.x, box.z, box.width, box.depth)
+        undo = (rows, cols, self.heights[rows, cols].copy(), self.fragile_top[rows, cols].copy(), self.frontier)
+        top = box.y + box.height
+        covered = self.heights[rows, cols] <= top + HEIGHT_TOLERANCE
+        self.heights[rows, cols][covered] = top
+        self.fragile_top[rows, cols][covered] = box.is_fragile
+        self.frontier = max(self.frontier, cols.stop - 1)
+        return undo
+
+    def restore(self, undo):
+        rows, cols, heights, fragile_top, frontier = undo
+        self.heights[rows, cols] = heights
+        self.fragile_top[rows, cols] = fragile_top
+        self.frontier = frontier
+
+    # Non-fragile resting position for a box of the given size on a flat part of the surface, as (x, y, z).
+    # The load is built from the back wall forward: smallest z first, then the lowest resting height, then smallest x.
+    # supported (if given) is asked about the candidates in that order, and the first one it accepts is returned.
+    def find_position(self, width, height, depth, eps=1e-6, supported=None):
+        cells_x, cells_z = self.cells(width), self.cells(depth)
+        last_i = min(math.floor((self.container['width'] - width) / self.resolution + 1e-9), self.nx - cells_x)
+        last_j = min(math.floor((self.container['depth'] - depth) / self.resolution + 1e-9), self.nz - cells_z)
+        # Positions starting past the frontier are empty floor, and the first of them beats all the others
+        last_j = min(last_j, self.frontier + 1)
+        if last_i < 0 or last_j < 0:
+            return None
+
+        heights = self.heights[:last_i + cells_x, :last_j + cells_z]
+        rest = window_max(heights, cells_x, cells_z)
+        flat = rest - window_min(heights, cells_x, cells_z) <= HEIGHT_TOLERANCE
+        on_fragile = window_max(self.fragile_top[:last_i + cells_x, :last_j + cells_z], cells_x, cells_z)
+        valid = flat & ~on_fragile & (rest + height <= self.container['height'] + eps)
+        if not valid.any():
+            return None
+
+        rows, cols = np.nonzero(valid)
+        for k in np.lexsort((rows, rest[rows, cols], cols)):
+            i, j = rows[k], cols[k]
+            position = (float(i * self.resolution), float(rest[i, j]), float(j * self.resolution))
+            if supported is None or supported(position):
+                return position
+        return None
@@ -0,0 +1,89 @@
+import time
+import threading
+import multiprocessing
+from collections import defaultdict
+from contextlib import nullcontext
+
+# This file holds optional counters and phase timers for the packing engine. They are off by default: count() is then
+# a single flag check and phase() returns a shared no-op context manager, so the hot paths pay next to nothing.
+# The state is per thread, so optimizations running side by side in one process (background jobs) keep separate
+# stats. Searches running in pool workers return snapshot() from the worker and the parent merge()s it.
+
+class _State(threading.local):
+    def __init__(self):
+        self.enabled = False
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+
+state = _State()
+_DISABLED = nullcontext()
+
+
+def enable(enabled=True):
+    state.enabled = enabled
+
+
+def reset():
+    state.counters.clear()
+    state.timers.clear()
+
+
+def count(name, amount=1):
+    if state.enabled:
+        state.counters[name] += amount
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        state.timers[self.name] += time.perf_counter() - self.start
+        state.counters[self.name + ".calls"] += 1
+
+
+# Time a block: `with phase("place.corner"): ...`
+def phase(name):
+    return _Phase(name) if state.enabled else _DISABLED
+
+
+def snapshot():
+    return {"counters": dict(state.counters), "timers": dict(state.timers)}
+
+
+def merge(stats):
+    if not stats:
+        return
+    for name, value in stats["counters"].items():
+        state.counters[name] += value
+    for name, value in stats["timers"].items():
+        state.timers[name] += value
+
+
+# Start collecting in a search function that may run in a pool worker. Returns True there: the worker starts from
+# clean counters and should hand snapshot() back to the parent. In the parent's own thread counting just continues.
+def start_worker_stats(collect_stats):
+    if not collect_stats:
+        return False
+    enable()
+    if multiprocessing.parent_process() is None:
+        return False
+    reset()
+    return True
+
+
+# Stats block for API results: counters, timers in milliseconds, and evaluations per second of evaluation time
+def summary():
+    stats = snapshot()
+    evaluations = stats["counters"].get("evaluations", 0)
+    evaluate_time = stats["timers"].get("evaluate", 0.0)
+    return {
+        "counters": dict(sorted(stats["counters"].items())),
+        "timers_ms": {name: round(value * 1000, 3) for name, value in sorted(stats["timers"].items())},
+        "evaluations_per_second": round(evaluations / evaluate_time, 1) if evaluate_time else None
+    }
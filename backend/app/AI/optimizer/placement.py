@@ -0,0 +1,353 @@
+import math
+import numpy as np
+
+# This file defines PlacedBoxes, the list of boxes already placed in the container.
+# Next to the Box objects it keeps two views of the same data:
+#   - a uniform grid index, used by the scalar helpers in cost_functions.py to look only at nearby boxes
+#   - struct-of-arrays NumPy copies of the box extents, used to test a candidate position (or a whole batch
+#     of candidate positions) against every placed box in one vectorized operation
+#   - an index of the top faces by height, so support is computed only from the boxes a new box can rest on
+#   - the face contacts of every box, recorded as boxes are appended, so the touching bonus is a running total
+# It also maintains the extreme points of the layout (the corners where a new box can be pushed into),
+# updated every time a box is appended, so the placement search only has to try a few positions per placed box.
+# It behaves like a list, so code that iterates over the placed boxes keeps working.
+
+GRID_DIVISIONS = 16   # Cells along the longest container side
+LINEAR_SCAN_LIMIT = 12  # Below this many boxes a plain scan is cheaper than a grid lookup
+INITIAL_CAPACITY = 64
+TOP_BUCKET = 1e-3     # Height resolution of the top-face index
+
+
+class PlacedBoxes:
+    def __init__(self, container, boxes=(), cell_size=None, heightmap=None):
+        if cell_size is None:
+            cell_size = max(container['width'], container['height'], container['depth']) / GRID_DIVISIONS
+        self.cell_size = cell_size
+        self.boxes = []
+        self.cells = {}       # (i, j, k) -> ids of the boxes overlapping that cell
+        self.low = None       # Smallest occupied cell index per axis
+        self.high = None      # Largest occupied cell index per axis
+
+        # Struct-of-arrays geometry, rows [0, len(self)) are valid
+        self.start = np.empty((INITIAL_CAPACITY, 3))   # x, y, z
+        self.end = np.empty((INITIAL_CAPACITY, 3))     # x + width, y + height, z + depth
+        self.fragile = np.empty(INITIAL_CAPACITY, dtype=bool)
+        self.contacts = np.zeros(INITIAL_CAPACITY, dtype=np.int64)  # Face contacts of each box with the other boxes
+        self.on_wall = np.empty(INITIAL_CAPACITY, dtype=bool)
+
+        self.tops = {}        # round(top / TOP_BUCKET) -> ids of the boxes whose top face is at that height
+        self.extreme_points = {(0.0, 0.0, 0.0)}
+        self.heightmap = heightmap  # Optional HeightMap kept in sync for the height-map placement mode
+        self.history = []     # Per-box undo records for truncate()
+
+        for box in boxes:
+            self.append(box)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        return iter(self.boxes)
+
+    def __getitem__(self, idx):
+        return self.boxes[idx]
+
+    def cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def append(self, box):
+        box_id = len(self.boxes)
+        self.boxes.append(box)
+
+        if box_id == len(self.fragile):
+            self.start = np.concatenate([self.start, np.empty_like(self.start)])
+            self.end = np.concatenate([self.end, np.empty_like(self.end)])
+            self.fragile = np.concatenate([self.fragile, np.empty_like(self.fragile)])
+            self.contacts = np.concatenate([self.contacts, np.zeros_like(self.contacts)])
+            self.on_wall = np.concatenate([self.on_wall, np.empty_like(self.on_wall)])
+        self.start[box_id] = (box.x, box.y, box.z)
+        self.end[box_id] = (box.x + box.width, box.y + box.height, box.z + box.depth)
+        self.fragile[box_id] = box.is_fragile
+        top_key = round(self.end[box_id, 1] / TOP_BUCKET)
+        self.tops.setdefault(top_key, []).append(box_id)
+
+        low = (self.cell(box.x), self.cell(box.y), self.cell(box.z))
+        high = (self.cell(box.x + box.width), self.cell(box.y + box.height), self.cell(box.z + box.depth))
+        cells = [(i, j, k)
+                 for i in range(low[0], high[0] + 1)
+                 for j in range(low[1], high[1] + 1)
+                 for k in range(low[2], high[2] + 1)]
+        for key in cells:
+            self.cells.setdefault(key, []).append(box_id)
+        bounds = (self.low, self.high)
+        if self.low is None:
+            self.low, self.high = low, high
+        else:
+            self.low = tuple(map(min, self.low, low))
+            self.high = tuple(map(max, self.high, high))
+
+        removed_points, added_points = self.update_extreme_points(box_id)
+        touching = self.record_contacts(box_id)
+        heightmap_undo = self.heightmap.add(box) if self.heightmap is not None else None
+
+        # Everything needed to take this box out again, see truncate()
+        self.history.append((top_key, cells, bounds, removed_points, added_points, touching, heightmap_undo))
+
+    # Remove the boxes placed after the first `count`, restoring every index to the state it had back then
+    def truncate(self, count):
+        while len(self.boxes) > count:
+            box_id = len(self.boxes) - 1
+            top_key, cells, bounds, removed_points, added_points, touching, heightmap_undo = self.history.pop()
+            self.boxes.pop()
+            self.tops[top_key].pop()
+            for key in cells:
+                self.cells[key].pop()
+            self.low, self.high = bounds
+            self.extreme_points -= added_points
+            self.extreme_points |= removed_points
+            self.contacts[touching] -= 1
+            self.contacts[box_id] = 0
+            if heightmap_undo is not None:
+                self.heightmap.restore(heightmap_undo)
+
+    # ---- Extreme points ----
+
+    # Slide each point backwards along its axis until it hits the far side of a placed box (or the wall at 0)
+    def project(self, points, axes):
+        n = len(self.boxes)
+        start, end = self.start[:n], self.end[:n]
+        rows = np.arange(len(points))
+        coords = points[rows, axes]
+
+        inside = (start[None, :, :] <= points[:, None, :]) & (points[:, None, :] < end[None, :, :])
+        inside[rows, :, axes] = end[:, axes].T <= coords[:, None]   # Along the projection axis: box lies behind
+        blocking = inside.all(axis=2)
+        far_sides = np.where(blocking, end[:, axes].T, 0.0)
+
+        projected = points.copy()
+        projected[rows, axes] = far_sides.max(axis=1) if n else 0.0
+        return projected
+
+    # Returns the points removed from and added to the set, so truncate() can undo the update
+    def update_extreme_points(self, box_id):
+        x, y, z = (float(v) for v in self.start[box_id])
+        end_x, end_y, end_z = (float(v) for v in self.end[box_id])
+
+        # Points now buried inside the new box can never be used again
+        removed = {
+            p for p in self.extreme_points
+            if x <= p[0] < end_x and y <= p[1] < end_y and z <= p[2] < end_z
+        }
+        self.extreme_points -= removed
+
+        # Each of the three outer corners of the new box, pushed back along the two other axes
+        corners = np.array([
+            (end_x, y, z), (end_x, y, z),
+            (x, end_y, z), (x, end_y, z),
+            (x, y, end_z), (x, y, end_z),
+        ])
+        projected = self.project(corners, np.array([1, 2, 0, 2, 0, 1]))
+        added = {tuple(float(v) for v in p) for p in projected} - self.extreme_points
+        self.extreme_points |= added
+        return removed, added
+
+    # Extreme points as a (K, 3) array, bottom layer first and then front to back, left to right
+    def extreme_point_array(self):
+        points = np.array(sorted(self.extreme_points, key=lambda p: (p[1], p[2], p[0])))
+        return points.reshape(-1, 3)
+
+    # ---- Grid index ----
+
+    def cell_range(self, start, end, axis):
+        # Clamp to the occupied cells, which also handles unbounded (infinite) query sides
+        lo = self.low[axis] if start == -math.inf else max(self.cell(start), self.low[axis])
+        hi = self.high[axis] if end == math.inf else min(self.cell(end), self.high[axis])
+        return range(lo, hi + 1)
+
+    # Position of a placed box (usually the last one appended), or None
+    def index_of(self, box):
+        if self.boxes and self.boxes[-1] is box:
+            return len(self.boxes) - 1
+        return next((idx for idx, other in enumerate(self.boxes) if other is box), None)
+
+    # Ids of the boxes whose extent may intersect the closed region [x0, x1] x [y0, y1] x [z0, z1]
+    def query_ids(self, x0, y0, z0, x1, y1, z1):
+        if len(self.boxes) <= LINEAR_SCAN_LIMIT:
+            return list(range(len(self.boxes)))
+        ids = set()
+        for i in self.cell_range(x0, x1, 0):
+            for j in self.cell_range(y0, y1, 1):
+                for k in self.cell_range(z0, z1, 2):
+                    ids.update(self.cells.get((i, j, k), ()))
+        return sorted(ids)
+
+    # Boxes whose extent may intersect the closed region [x0, x1] x [y0, y1] x [z0, z1]
+    def query(self, x0, y0, z0, x1, y1, z1):
+        if len(self.boxes) <= LINEAR_SCAN_LIMIT:
+            return self.boxes
+        return [self.boxes[box_id] for box_id in self.query_ids(x0, y0, z0, x1, y1, z1)]
+
+    # Boxes within `margin` of the box; axes listed in `unbounded` are not restricted at all
+    def near(self, box, margin=0.0, unbounded=()):
+        pad = margin + 1e-6
+        x0, y0, z0 = box.x - pad, box.y - pad, box.z - pad
+        x1, y1, z1 = box.x + box.width + pad, box.y + box.height + pad, box.z + box.depth + pad
+        if 'x' in unbounded: x0, x1 = -math.inf, math.inf
+        if 'y' in unbounded: y0, y1 = -math.inf, math.inf
+        if 'z' in unbounded: z0, z1 = -math.inf, math.inf
+        return self.query(x0, y0, z0, x1, y1, z1)
+
+    # ---- Vectorized kernels ----
+    # Candidates are given as a (K, 3) array of x, y, z positions for a box of size `dims` = (width, height, depth).
+    # The comparisons mirror the scalar helpers in cost_functions.py exactly, including their tolerances.
+
+    def overlap_mask(self, positions, dims, eps=1e-6):
+        n = len(self.boxes)
+        if n == 0:
+            return np.zeros(len(positions), dtype=bool)
+        start, end = self.start[:n], self.end[:n]
+        cand_end = positions + dims
+
+        # Only boxes that intersect the bounding region of the whole batch can overlap any candidate
+        relevant = np.all((start < cand_end.max(axis=0)) & (end > positions.min(axis=0)), axis=1)
+        if not relevant.any():
+            return np.zeros(len(positions), dtype=bool)
+        start, end = start[relevant], end[relevant]
+
+        separated = ((cand_end[:, None, :] <= start[None, :, :] + eps) |
+                     (end[None, :, :] <= positions[:, None, :] + eps))
+        return (~separated.any(axis=2)).any(axis=1)
+
+    # Same test as is_on_top_of_fragile for every candidate
+    def fragile_below_mask(self, positions, dims):
+        n = len(self.boxes)
+        fragile = np.flatnonzero(self.fragile[:n])
+        if len(fragile) == 0:
+            return np.zeros(len(positions), dtype=bool)
+        start, end = self.start[fragile], self.end[fragile]
+        cand_end = positions + dims
+
+        xy_separated = ((cand_end[:, None, :2] <= start[None, :, :2]) |
+                        (end[None, :, :2] <= positions[:, None, :2]))
+        above = positions[:, None, 1] >= end[None, :, 1] - 1e-3
+        return ((~xy_separated.any(axis=2)) & above).any(axis=1)
+
+    # Ids of the boxes whose top face is at `height` (same tolerance as np.isclose(top, height, atol=1e-3))
+    def boxes_topping_at(self, height):
+        key = round(height / TOP_BUCKET)
+        ids = [box_id for k in range(key - 2, key + 3) for box_id in self.tops.get(k, ())]
+        return [box_id for box_id in ids if abs(self.end[box_id, 1] - height) <= 1e-3 + 1e-5 * abs(height)]
+
+    # Exact fraction of the base of a box at `position` that rests on the floor or on top faces at its base height
+    def support_ratio(self, position, dims):
+        x, y, z = (float(v) for v in position)
+        width, depth = float(dims[0]), float(dims[2])
+        if abs(y) <= 1e-3:  # Ground contact counts as support
+            return 1.0
+        ids = self.boxes_topping_at(y)
+        if not ids:
+            return 0.0
+        faces = np.column_stack([self.start[ids, 0], self.start[ids, 2], self.end[ids, 0], self.end[ids, 2]])
+        return covered_ratio(x, z, x + width, z + depth, faces)
+
+    # Same as support_ratio(position, dims) >= 1.0, the test placement runs on every candidate. Most candidates are
+    # settled without building the cell grid: one top face covering the whole base supports it, and faces whose
+    # clipped areas do not even add up to the base cannot (the ratio snaps to 1.0 only above 1 - 1e-9).
+    def fully_supported(self, position, dims):
+        x, y, z = (float(v) for v in position)
+        x1, z1 = x + float(dims[0]), z + float(dims[2])
+        if abs(y) <= 1e-3:  # Ground contact counts as support
+            return True
+        ids = self.boxes_topping_at(y)
+        if not ids:
+            return False
+        area = (x1 - x) * (z1 - z)
+        if area <= 0:
+            return False
+        covered = 0.0
+        for box_id in ids:
+            fx0, fz0, fx1, fz1 = self.start[box_id, 0], self.start[box_id, 2], self.end[box_id, 0], self.end[box_id, 2]
+            if fx0 <= x and fz0 <= z and fx1 >= x1 and fz1 >= z1:
+                return True
+            width, depth = min(fx1, x1) - max(fx0, x), min(fz1, z1) - max(fz0, z)
+            if width > 0 and depth > 0:
+                covered += width * depth
+        if covered < area * (1.0 - 2e-9):
+            return False
+        return self.support_ratio(position, dims) >= 1.0
+
+    # Which of the boxes `ids` face a box spanning [low, high] across a gap below `tolerance` while overlapping it
+    # on the two other axes. With the default tolerance this is is_touching(box, [other]).
+    def contact_mask(self, low, high, ids, tolerance=1e-3):
+        start, end = self.start[ids], self.end[ids]
+
+        # Gap between the facing sides along each axis, and overlap of the projections on each axis
+        flush = (np.abs(high - start) < tolerance) | (np.abs(end - low) < tolerance)
+        spans = ~((high <= start) | (end <= low))
+        return ((flush[:, 0] & spans[:, 1] & spans[:, 2]) |
+                (flush[:, 1] & spans[:, 0] & spans[:, 2]) |
+                (flush[:, 2] & spans[:, 0] & spans[:, 1]))
+
+    # Same test as is_gap_too_large for the placed box `box_id`: no other box within `threshold` of one of its faces
+    def gap_too_large(self, box_id, threshold=1.5):
+        others = np.arange(len(self.boxes)) != box_id
+        near = self.contact_mask(self.start[box_id], self.end[box_id], slice(0, len(self.boxes)), threshold)
+        return not (near & others).any()
+
+    # ---- Contacts ----
+
+    # Record the face contacts of a newly placed box; only boxes within the contact tolerance can touch it
+    def record_contacts(self, box_id):
+        low, high = self.start[box_id], self.end[box_id]
+        pad = 1e-3 + 1e-6
+        ids = [other for other in self.query_ids(*(low - pad), *(high + pad)) if other != box_id]
+        touching = np.asarray(ids, dtype=np.intp)
+        if ids:
+            touching = touching[self.contact_mask(low, high, ids)]
+        self.contacts[touching] += 1
+        self.contacts[box_id] = len(touching)
+        box = self.boxes[box_id]
+        self.on_wall[box_id] = box.x == 0 or box.y == 0 or box.z == 0
+        return touching
+
+    # Sum of is_touching(box, [other]) over every ordered pair of placed boxes.
+    # A box against a wall counts as touching every other box, the others count their face contacts.
+    def touching_bonus(self):
+        n = len(self.boxes)
+        on_wall = self.on_wall[:n]
+        return int(on_wall.sum()) * (n - 1) + int(self.contacts[:n][~on_wall].sum())
+
+
+# Candidate neighbours of a box: the grid lookup for PlacedBoxes, every box for a plain list
+def nearby(placed_boxes, box, margin=0.0, unbounded=()):
+    if isinstance(placed_boxes, PlacedBoxes):
+        return placed_boxes.near(box, margin, unbounded)
+    return placed_boxes
+
+
+# Exact fraction of the rectangle [x0, x1] x [z0, z1] covered by the union of `faces` (rows of x0, z0, x1, z1).
+# The covering rectangles are cut into the cells of their compressed coordinates, so overlaps are not double counted.
+def covered_ratio(x0, z0, x1, z1, faces):
+    area = (x1 - x0) * (z1 - z0)
+    if area <= 0:
+        return 0.0
+    faces = np.column_stack([
+        np.clip(faces[:, 0], x0, x1), np.clip(faces[:, 1], z0, z1),
+        np.clip(faces[:, 2], x0, x1), np.clip(faces[:, 3], z0, z1),
+    ])
+    faces = faces[(faces[:, 2] > faces[:, 0]) & (faces[:, 3] > faces[:, 1])]
+    if len(faces) == 0:
+        return 0.0
+
+    xs = np.unique(np.concatenate([faces[:, 0], faces[:, 2]]))
+    zs = np.unique(np.concatenate([faces[:, 1], faces[:, 3]]))
+    mid_x = (xs[:-1] + xs[1:]) / 2
+    mid_z = (zs[:-1] + zs[1:]) / 2
+    in_x = (faces[None, :, 0] <= mid_x[:, None]) & (mid_x[:, None] <= faces[None, :, 2])
+    in_z = (faces[None, :, 1] <= mid_z[:, None]) & (mid_z[:, None] <= faces[None, :, 3])
+    covered = (in_x[:, None, :] & in_z[None, :, :]).any(axis=2)
+    covered_area = float(np.outer(np.diff(xs), np.diff(zs))[covered].sum())
+
+    ratio = covered_area / area
+    # Snap float noise so a fully supported base compares equal to 1.0
+    return 1.0 if ratio > 1.0 - 1e-9 else ratio
@@ -0,0 +1,71 @@
+from .cost_functions import box_fits_in_container
+
+# This file answers "can these boxes possibly fit?" in milliseconds, before any search runs.
+# Each check is a necessary condition for a packing to exist, so a failed check proves the instance infeasible;
+# passing all of them does not prove it feasible. prescreen() returns None when every check passes, otherwise a
+# structured reason: {"code", "message", ...details}. Sizes are in the units of the container and boxes given.
+
+AXES = ("width", "height", "depth")
+
+
+# Dimensions of every orientation of the box that fits in the container on its own
+def fitting_orientations(box, container, eps=1e-6):
+    rotated = box.copy()
+    fitting = []
+    for idx in range(len(box.orientation)):
+        rotated.rotate(idx)
+        if box_fits_in_container(rotated, container, eps):
+            fitting.append({"width": rotated.width, "height": rotated.height, "depth": rotated.depth})
+    return fitting
+
+
+# Stacking bound along one axis: a box whose two other sides are each longer than half the container in every
+# fitting orientation overlaps every other such box when projected onto the plane of those sides, so all of them
+# have to be lined up along the axis. Returns the boxes involved and the shortest total length they need.
+def stacking_requirement(fitting, container, axis):
+    across = [other for other in AXES if other != axis]
+    involved, required = [], 0.0
+    for box, orientations in fitting:
+        if all(o[a] > container[a] / 2 for o in orientations for a in across):
+            involved.append(box)
+            required += min(o[axis] for o in orientations)
+    return involved, required
+
+
+def prescreen(container, boxes, eps=1e-6):
+    # 1. Every box must fit in some orientation
+    fitting = [(box, fitting_orientations(box, container, eps)) for box in boxes]
+    too_large = [box.item_id for box, orientations in fitting if not orientations]
+    if too_large:
+        return {
+            "code": "box_too_large",
+            "message": f"{len(too_large)} box(es) do not fit in the container in any orientation",
+            "item_ids": too_large
+        }
+
+    # 2. Volume bound
+    container_volume = container["width"] * container["height"] * container["depth"]
+    items_volume = sum(box.original_width * box.original_height * box.original_depth for box in boxes)
+    if items_volume > container_volume * (1 + 1e-9):
+        return {
+            "code": "volume_exceeded",
+            "message": f"Total item volume {items_volume:.4f} exceeds container volume {container_volume:.4f}",
+            "items_volume": items_volume,
+            "container_volume": container_volume
+        }
+
+    # 3. Stacking bound along each axis
+    for axis in AXES:
+        involved, required = stacking_requirement(fitting, container, axis)
+        if len(involved) > 1 and required > container[axis] + eps:
+            return {
+                "code": "stacking_bound_exceeded",
+                "message": (f"{len(involved)} boxes are too large to sit side by side and need {required:.4f} "
+                            f"of the container {axis}, which is only {container[axis]:.4f}"),
+                "axis": axis,
+                "item_ids": [box.item_id for box in involved],
+                "required": required,
+                "available": container[axis]
+            }
+
+    return None
@@ -1,57 +1,385 @@
+import os
 import random
 import math
-from .cost_functions import advanced_cost_function
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .cost_functions import IncrementalCostEvaluator, advanced_cost_function
+from .heightmap import DEFAULT_RESOLUTION
+from . import instrumentation
 
-def perturb(solution):
-    new_solution = [b.copy() for b in solution]
-    op = random.choice(["swap", "rotate", "move"])
+# Start method of the optimizer process pools (and of the progress queue manager in ai.py). The optimizer runs inside
+# multi-threaded processes (gunicorn gthread workers, the job pool and its heartbeat thread), and a forked child only
+# gets the forking thread: a lock another thread held at that moment stays locked in the child forever. Pool workers
+# are therefore forked from a single-threaded fork server, which imports the optimizer once up front so each worker
+# starts ready to run; spawn is used where there is no fork server.
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if POOL_CONTEXT.get_start_method() == "forkserver":
+    POOL_CONTEXT.set_forkserver_preload(["app.AI.ai"])
 
-    if op == "swap" and len(new_solution) >= 2:
-        i, j = random.sample(range(len(new_solution)), 2)
-        new_solution[i], new_solution[j] = new_solution[j], new_solution[i]
+# Adaptive schedule settings. Costs range from fractions of a unit to the 1e12 infeasibility penalty, so a fixed
+# starting temperature means something different for every instance; it is calibrated from sampled move deltas instead.
+CALIBRATION_SAMPLES = 30
+INITIAL_ACCEPTANCE = 0.8    # Uphill acceptance rate targeted at the start of the run...
+FINAL_ACCEPTANCE = 0.01     # ...decaying linearly to this one by the end of the run (see cooling_progress)
+ADAPT_WINDOW = 20           # Iterations between temperature adjustments
+ADAPT_FACTOR = 0.8          # Correction per adjustment when the measured acceptance misses the target
+REHEAT_AFTER = 100          # Iterations without a new best before reheating, if patience leaves as many to cool again
+REHEAT_RATIO = 0.5          # Reheat to this fraction of the calibrated starting temperature
+MIN_TEMPERATURE = 1e-9
 
+# The search state is a genome: `order` is a permutation of indices into the input boxes and `rotations` holds the
+# orientation index of every input box, the one placement tries first (Box.preferred_orientation). Moves edit the
+# genome in place and return an undo record, so a rejected neighbor is rolled back instead of copying the whole
+# solution for every iteration. A rotate move always picks a different orientation when the box has more than one.
+# orientation_counts: number of allowed orientations of every input box (len(box.orientation))
+# rng: the random.Random of the run (defaults to the global random module)
+def perturb(order, rotations, orientation_counts, rng=random):
+    op = rng.choice(["swap", "rotate", "move"])
+
+    if op == "swap" and len(order) >= 2:
+        i, j = rng.sample(range(len(order)), 2)
+        order[i], order[j] = order[j], order[i]
+        return ("swap", i, j)
+
+    elif op == "rotate":
+        i = rng.randint(0, len(order) - 1)
+        box_idx = order[i]
+        previous = rotations[box_idx]
+        if orientation_counts[box_idx] > 1:
+            rotation = rng.randrange(orientation_counts[box_idx] - 1)
+            rotations[box_idx] = rotation + (rotation >= previous)
+        return ("rotate", box_idx, previous)
+
+    elif op == "move" and len(order) >= 2:
+        i = rng.randint(0, len(order) - 1)
+        box_idx = order.pop(i)
+        j = rng.randint(0, len(order))
+        order.insert(j, box_idx)
+        return ("move", i, j)
+
+    return None
+
+def undo_perturb(order, rotations, move):
+    if move is None:
+        return
+    op, a, b = move
+    if op == "swap":
+        order[a], order[b] = order[b], order[a]
     elif op == "rotate":
-        i = random.randint(0, len(new_solution) - 1)
-        new_solution[i].rotate(random.randint(0, 5))
+        rotations[a] = b
+    elif op == "move":
+        order.insert(a, order.pop(b))
+
+# The scratch boxes of a genome in placement order, each set to try its rotation gene first
+def genome_boxes(work_boxes, order, rotations):
+    arranged = []
+    for box_idx in order:
+        box = work_boxes[box_idx]
+        box.preferred_orientation = rotations[box_idx]
+        arranged.append(box)
+    return arranged
+
+# Materialize a genome into positioned Box copies
+def decode(boxes, order, rotations, container, placement_mode="contact", heightmap_resolution=DEFAULT_RESOLUTION):
+    solution = genome_boxes([box.copy() for box in boxes], order, rotations)
+    cost = advanced_cost_function(solution, container, placement_mode=placement_mode,
+                                  heightmap_resolution=heightmap_resolution)
+    return solution, cost
+
+# Starting temperature at which an average uphill move is accepted with probability `acceptance`.
+# Samples random moves around the genome (undoing each one) and ignores moves into or out of infeasible layouts,
+# whose penalty-sized deltas would swamp the real cost differences. Falls back to `default` without samples.
+def calibrate_temperature(evaluator, work_boxes, order, rotations, current_cost, default, samples=CALIBRATION_SAMPLES,
+                          deadline=None, rng=random, acceptance=INITIAL_ACCEPTANCE):
+    orientation_counts = [len(box.orientation) for box in work_boxes]
+    deltas = []
+    for _ in range(samples):
+        if should_stop(deadline, None, 0):
+            break
+        move = perturb(order, rotations, orientation_counts, rng)
+        cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+        undo_perturb(order, rotations, move)
+        if current_cost < 1e12 and cost < 1e12 and cost > current_cost:
+            deltas.append(cost - current_cost)
+    if not deltas:
+        return default
+    return -(sum(deltas) / len(deltas)) / math.log(acceptance)
+
+# Fraction of the run done, measured against whichever ends it first: the iteration cap or the deadline
+def run_progress(iteration, max_iter, start_time, deadline):
+    progress = iteration / max_iter
+    if deadline is not None:
+        progress = max(progress, (time.time() - start_time) / max(deadline - start_time, 1e-9))
+    return min(progress, 1.0)
 
-    elif op == "move" and len(new_solution) >= 2:
-        i = random.randint(0, len(new_solution) - 1)
-        box = new_solution.pop(i)
-        new_solution.insert(random.randint(0, len(new_solution)), box)
+# Fraction of the cooling horizon used up. Besides max_iter and the deadline, a run also ends after `patience`
+# iterations without a new best, so the stall counts as progress too: every run cools down fully before it stops,
+# and a new best moves the target back up. The search loops also report it as their progress, since runs stopped
+# by patience never get near max_iter (it can move back after a new best; run_ai_optimizer keeps its events monotone).
+def cooling_progress(iteration, max_iter, start_time, deadline, stale_iterations, patience):
+    progress = run_progress(iteration, max_iter, start_time, deadline)
+    if patience:
+        progress = max(progress, stale_iterations / patience)
+    return min(progress, 1.0)
 
-    return new_solution
+# Progress reporting shared by the search loops. progress_callback receives a dict with iteration, temperature,
+# current_cost, best_cost, progress (0..1) and best_solution: the decoded best layout if the best cost changed since
+# the previous event, else None (decoding costs a full placement, so unchanged layouts are not re-sent).
+# Returns the best cost that has now been reported.
+def report_progress(progress_callback, boxes, container, placement_mode, heightmap_resolution, best_genome, reported_best,
+                    **event):
+    best_solution = None
+    if event["best_cost"] < 1e12 and event["best_cost"] != reported_best:
+        best_solution, _ = decode(boxes, *best_genome, container, placement_mode, heightmap_resolution)
+        reported_best = event["best_cost"]
+    progress_callback(dict(event, best_solution=best_solution))
+    return reported_best
+
+# Anytime stopping shared by the search loops: past the wall-clock deadline (a time.time() value, None for no
+# deadline), or after `patience` iterations without a new best (None to disable)
+def should_stop(deadline, patience, stale_iterations):
+    if deadline is not None and time.time() >= deadline:
+        return True
+    return patience is not None and stale_iterations >= patience
 
 # This file implements the simulated annealing algorithm for optimizing box placement. It uses a cost function to evaluate the current placement and searches for better solutions via random perturbations.
-def simulated_annealing(boxes, container, initial_temp=1000, cooling_rate=0.99, stop_T=1, max_iter=10000):
-    current_solution = [b.copy() for b in boxes]
-    current_cost = advanced_cost_function(current_solution, container)
-    best_solution = [b.copy() for b in current_solution]
+# The search also stops at `deadline` or after `patience` iterations without improvement, returning the best layout found so far.
+# schedule="adaptive" (default): the starting temperature is calibrated (initial_temp is only the fallback), then the
+# uphill acceptance rate follows a target decaying from initial_acceptance to FINAL_ACCEPTANCE over the run (see
+# cooling_progress). Every ADAPT_WINDOW iterations T moves with the target (T scales with -1 / log(acceptance) for a
+# fixed uphill delta) and is corrected by ADAPT_FACTOR towards the acceptance measured on feasible uphill moves.
+# It is reheated after REHEAT_AFTER iterations without improvement as long as patience leaves at least REHEAT_AFTER
+# more iterations to cool down again.
+# The run ends at max_iter. schedule="geometric": T *= cooling_rate every iteration until stop_T.
+# Every progress_interval iterations progress_callback (if given) receives a progress event, see report_progress.
+# All randomness comes from one random.Random(seed): the same seed and inputs give the same layout and iteration
+# count in any process, as long as no deadline cuts the run short.
+# initial: starting genome (order, rotations), e.g. greedy_layout_genome() from greedy.py; default the given box order
+# unrotated. A low initial_acceptance keeps the run close to that layout: it improves it instead of first scrambling it.
+def simulated_annealing(boxes, container, initial_temp=1000, cooling_rate=0.99, stop_T=1, max_iter=10000, placement_mode="contact",
+                        deadline=None, patience=None, schedule="adaptive", progress_callback=None, progress_interval=100,
+                        seed=None, initial=None, heightmap_resolution=DEFAULT_RESOLUTION,
+                        initial_acceptance=INITIAL_ACCEPTANCE):
+    if schedule not in ("adaptive", "geometric"):
+        raise ValueError(f"Unknown schedule '{schedule}', expected 'adaptive' or 'geometric'")
+    adaptive = schedule == "adaptive"
+    rng = random.Random(seed)
+
+    # Neighbors share most of their volume-sorted order with the previous evaluation,
+    # so only the boxes after the first changed position are re-placed
+    evaluator = IncrementalCostEvaluator(container, placement_mode, heightmap_resolution=heightmap_resolution)
+
+    # One scratch copy per input box is reused for every evaluation; only the genome changes between iterations
+    work_boxes = [b.copy() for b in boxes]
+    orientation_counts = [len(box.orientation) for box in boxes]
+    if initial is None:
+        order, rotations = list(range(len(boxes))), [0] * len(boxes)
+    else:
+        order, rotations = list(initial[0]), list(initial[1])
+
+    current_cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+    best_order, best_rotations = order[:], rotations[:]
     best_cost = current_cost
 
     T = initial_temp
+    if adaptive:
+        T = calibrate_temperature(evaluator, work_boxes, order, rotations, current_cost, initial_temp, deadline=deadline, rng=rng,
+                                  acceptance=initial_acceptance)
+    start_T = T
+    start_time = time.time()
     iteration = 0
+    stale_iterations = 0
+    uphill = uphill_accepted = 0
+    target = initial_acceptance
+    reported_best = None
+
+    while (adaptive or T > stop_T) and iteration < max_iter:
+        if should_stop(deadline, patience, stale_iterations):
+            print(f"⏹️ Stopping early at iteration {iteration} ({stale_iterations} iterations without improvement)")
+            break
 
-    while T > stop_T and iteration < max_iter:
-        neighbor = perturb(current_solution)
-        neighbor_cost = advanced_cost_function(neighbor, container)
+        move = perturb(order, rotations, orientation_counts, rng)
+        neighbor_cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+        stale_iterations += 1
+        instrumentation.count("sa_iterations")
 
         delta = neighbor_cost - current_cost
-        if delta < 0 or random.random() < math.exp(-delta / T):
-            current_solution = [b.copy() for b in neighbor]
+        # Moves into infeasible layouts are never accepted, so like the calibration the acceptance rate ignores them
+        measured = delta > 0 and neighbor_cost < 1e12 and current_cost < 1e12
+        if measured:
+            uphill += 1
+        if delta < 0 or rng.random() < math.exp(-delta / T):
             current_cost = neighbor_cost
+            if measured:
+                uphill_accepted += 1
             if current_cost < best_cost:
-                best_solution = [b.copy() for b in neighbor]
+                best_order[:] = order
+                best_rotations[:] = rotations
                 best_cost = current_cost
+                stale_iterations = 0
+        else:
+            undo_perturb(order, rotations, move)
 
-        if iteration % 100 == 0:
-            print(f"Iter {iteration}: Temp={T:.2f}, Cost={current_cost:.2f}, Best={best_cost:.2f}")
+        if progress_callback and iteration % progress_interval == 0:
+            reported_best = report_progress(
+                progress_callback, boxes, container, placement_mode, heightmap_resolution, (best_order, best_rotations),
+                reported_best,
+                iteration=iteration, temperature=T, current_cost=current_cost, best_cost=best_cost,
+                progress=cooling_progress(iteration, max_iter, start_time, deadline, stale_iterations, patience)
+            )
 
-        T *= cooling_rate
         iteration += 1
+        if not adaptive:
+            T *= cooling_rate
+            continue
 
+        reheat = stale_iterations and stale_iterations % REHEAT_AFTER == 0
+        if reheat and (patience is None or stale_iterations + REHEAT_AFTER < patience):
+            T = max(T, start_T * REHEAT_RATIO)
+        elif iteration % ADAPT_WINDOW == 0:
+            previous_target = target
+            progress = cooling_progress(iteration, max_iter, start_time, deadline, stale_iterations, patience)
+            target = initial_acceptance + (FINAL_ACCEPTANCE - initial_acceptance) * progress
+            T *= math.log(previous_target) / math.log(target)
+            if uphill:
+                T = T * ADAPT_FACTOR if uphill_accepted / uphill > target else T / ADAPT_FACTOR
+                uphill = uphill_accepted = 0
+            T = max(T, MIN_TEMPERATURE)
+
+    print(f"🗂️ Fitness cache: {evaluator.cache_hits}/{evaluator.evaluations} evaluations served from cache ({evaluator.hit_rate():.0%})")
     if best_cost >= 1e12:
             print("❌ Final result invalid. No feasible solution found.")
             return None, float("inf")
     
+    best_solution, _ = decode(boxes, best_order, best_rotations, container, placement_mode, heightmap_resolution)
     print(f"✅ Optimization finished. Best cost: {best_cost:.2f}")
-    return best_solution, best_cost
\ No newline at end of file
+    return best_solution, best_cost
+
+# One replica of parallel tempering: `steps` Metropolis moves at a fixed temperature from the given genome.
+# Module-level so a process pool can run it; returns the final genome and the best genome seen on the way.
+# With collect_stats the instrumentation counters of a chain run in a pool worker come back as a last element.
+def tempering_chain(boxes, container, order, rotations, temperature, steps, seed, placement_mode="contact", deadline=None,
+                    collect_stats=False, heightmap_resolution=DEFAULT_RESOLUTION):
+    worker_stats = instrumentation.start_worker_stats(collect_stats)
+    rng = random.Random(seed)
+    evaluator = IncrementalCostEvaluator(container, placement_mode, heightmap_resolution=heightmap_resolution)
+    work_boxes = [b.copy() for b in boxes]
+    orientation_counts = [len(box.orientation) for box in boxes]
+
+    current_cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+    best_order, best_rotations = order[:], rotations[:]
+    best_cost = current_cost
+
+    for _ in range(steps):
+        if should_stop(deadline, None, 0):
+            break
+        move = perturb(order, rotations, orientation_counts, rng)
+        neighbor_cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+
+        delta = neighbor_cost - current_cost
+        if delta < 0 or rng.random() < math.exp(-delta / temperature):
+            current_cost = neighbor_cost
+            if current_cost < best_cost:
+                best_order[:] = order
+                best_rotations[:] = rotations
+                best_cost = current_cost
+        else:
+            undo_perturb(order, rotations, move)
+
+    stats = instrumentation.snapshot() if worker_stats else None
+    return order, rotations, current_cost, best_order, best_rotations, best_cost, stats
+
+# Parallel tempering: `replicas` chains at fixed temperatures on a geometric ladder from initial_temp down to stop_T.
+# Each round every chain runs exchange_interval steps (in separate processes when workers > 1), then neighboring
+# chains swap states with the replica-exchange acceptance rule, so good states drift to the cold end while the hot
+# chains keep exploring. Every migration_interval rounds the best genome found so far replaces the coldest chain.
+# deadline and patience (counted in chain steps) stop it early like simulated_annealing.
+# With calibrate=True the hottest temperature comes from calibrate_temperature and the ladder keeps the
+# initial_temp / stop_T ratio below it.
+# After every round progress_callback (if given) receives a progress event for the coldest chain, see report_progress.
+# seed drives the calibration, the exchanges and the per-round chain seeds, so results do not depend on the workers.
+def parallel_tempering(boxes, container, replicas=4, initial_temp=1000, stop_T=1, exchange_interval=50, rounds=14,
+                       migration_interval=5, workers=None, placement_mode="contact", deadline=None, patience=None,
+                       calibrate=True, progress_callback=None, collect_stats=False, seed=None,
+                       heightmap_resolution=DEFAULT_RESOLUTION):
+    replicas = max(2, replicas)
+    rng = random.Random(seed)
+    hottest = initial_temp
+    if calibrate:
+        evaluator = IncrementalCostEvaluator(container, placement_mode, heightmap_resolution=heightmap_resolution)
+        work_boxes = [b.copy() for b in boxes]
+        order, rotations = list(range(len(boxes))), [0] * len(boxes)
+        cost = evaluator.evaluate(genome_boxes(work_boxes, order, rotations))
+        hottest = calibrate_temperature(evaluator, work_boxes, order, rotations, cost, initial_temp, deadline=deadline, rng=rng)
+    ratio = (stop_T / initial_temp) ** (1 / (replicas - 1))
+    temperatures = [hottest * ratio ** k for k in range(replicas)]  # Hottest first
+
+    workers = max(1, min(workers or os.cpu_count() or 1, replicas))
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) if workers > 1 else None
+
+    states = [(list(range(len(boxes))), [0] * len(boxes)) for _ in temperatures]
+    costs = [float("inf")] * replicas
+    best_order, best_rotations, best_cost = states[-1][0][:], states[-1][1][:], float("inf")
+
+    stale_iterations = 0
+    start_time = time.time()
+    reported_best = None
+
+    try:
+        for round_idx in range(rounds):
+            if should_stop(deadline, patience, stale_iterations):
+                print(f"⏹️ Stopping early at round {round_idx} ({stale_iterations} steps without improvement)")
+                break
+
+            seeds = [rng.randrange(2**32) for _ in temperatures]
+            args = (
+                [boxes] * replicas, [container] * replicas,
+                [order for order, _ in states], [rotations for _, rotations in states],
+                temperatures, [exchange_interval] * replicas, seeds, [placement_mode] * replicas, [deadline] * replicas,
+                [collect_stats] * replicas, [heightmap_resolution] * replicas
+            )
+            outcomes = list(pool.map(tempering_chain, *args) if pool else map(tempering_chain, *args))
+            stale_iterations += exchange_interval
+
+            for k, (order, rotations, cost, chain_best_order, chain_best_rotations, chain_best_cost, stats) in enumerate(outcomes):
+                instrumentation.merge(stats)
+                states[k] = (order, rotations)
+                costs[k] = cost
+                if chain_best_cost < best_cost:
+                    best_order, best_rotations, best_cost = chain_best_order, chain_best_rotations, chain_best_cost
+                    stale_iterations = 0
+
+            # Replica exchange between neighboring temperatures
+            for k in range(replicas - 1):
+                log_accept = (1 / temperatures[k] - 1 / temperatures[k + 1]) * (costs[k] - costs[k + 1])
+                if log_accept >= 0 or rng.random() < math.exp(log_accept):
+                    states[k], states[k + 1] = states[k + 1], states[k]
+                    costs[k], costs[k + 1] = costs[k + 1], costs[k]
+
+            # Migration: restart the coldest chain from the best genome found so far
+            if (round_idx + 1) % migration_interval == 0 and best_cost < costs[-1]:
+                states[-1] = (best_order[:], best_rotations[:])
+                costs[-1] = best_cost
+
+            if progress_callback:
+                reported_best = report_progress(
+                    progress_callback, boxes, container, placement_mode, heightmap_resolution, (best_order, best_rotations),
+                    reported_best,
+                    iteration=(round_idx + 1) * exchange_interval, temperature=temperatures[-1], current_cost=costs[-1],
+                    best_cost=best_cost,
+                    progress=cooling_progress(round_idx + 1, rounds, start_time, deadline, stale_iterations, patience)
+                )
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if best_cost >= 1e12:
+        print("❌ Final result invalid. No feasible solution found.")
+        return None, float("inf")
+
+    best_solution, _ = decode(boxes, best_order, best_rotations, container, placement_mode, heightmap_resolution)
+    print(f"✅ Parallel tempering finished. Best cost: {best_cost:.2f}")
+    return best_solution, best_cost
@@ -1,14 +1,29 @@
-from flask import Blueprint, request, jsonify
+import json
+import threading
+import time
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.AI.schemas import OptimizeRequest
-from app.AI.ai import run_ai_optimizer
+from app.AI.ai import run_ai_optimizer, check_feasibility
+from app.AI.cache import run_cached_optimizer
+from app.AI.jobs import submit_job, job_to_dict, job_is_stale, fail_stale_jobs
+from app.AI.tasks import load_task_boxes, task_info, task_optimizer_options
+from app.AI.models import OptimizationJob, JobStatus
 from app.db.database import SessionLocal
 from app.Task.models import Task
 from app.Container.models import Container
 from app.Item.models import Item
-from app.auth.auth import token_required
+from app.auth.auth import token_required, stream_token_required, create_stream_token
 
 bp = Blueprint("ai", __name__, url_prefix="/api/ai")
 
+SSE_POLL_INTERVAL = 0.5  # Seconds between job row reads while streaming job events
+SSE_MAX_DURATION = 60    # Seconds before a job event stream is closed; EventSource clients reconnect on their own
+# Every open stream holds a gunicorn thread (8 per worker, see backend.Dockerfile); past this many per process new
+# streams get a 503 and clients fall back to polling /api/ai/jobs/<job_id>
+SSE_MAX_STREAMS = 4
+
+open_streams = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
 @bp.route("/optimize", methods=["POST"])
 def optimize():
     try:
@@ -19,7 +34,13 @@ def optimize():
         container = request_model.container.dict()
         boxes = [box.dict() for box in request_model.boxes]
 
-        result = run_ai_optimizer(container, boxes)
+        reason = check_feasibility(container, boxes)
+        if reason:
+            return jsonify({"status": "error", "message": f"Optimization failed: {reason['message']}", "reason": reason}), 400
+
+        options = {"beam_width": request_model.beam_width} if request_model.beam_width is not None else {}
+        result = run_ai_optimizer(container, boxes, time_budget_ms=request_model.time_budget_ms, seed=request_model.seed,
+                                  mode=request_model.mode, **options)
 
         # Check optimization result
         if result.get("cost", float("inf")) > 1e12:
@@ -40,66 +61,31 @@ def optimize_task(token_data, task_id):
     """Optimization API based on task ID - for frontend visualization usage"""
     db = SessionLocal()
     try:
-        # Get task
-        task = db.query(Task).filter(Task.task_id == task_id).first()
-        if not task:
-            return jsonify({"status": "error", "message": "Task not found"}), 404
+        options, error = task_optimizer_options(request.args)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        task, container, container_data, boxes_data, error = load_task_boxes(db, task_id, token_data)
+        if error:
+            print(f"❌ Task {task_id}: {error[0]}")
+            return jsonify({"status": "error", "message": error[0]}), error[1]
 
         print(f"=== CONTAINER DATA VERIFICATION FOR TASK {task_id} ===")
         print(f"Task found: ID={task.task_id}, name='{task.task_name}'")
-        print(f"Task.container_id = {task.container_id}")
-        
-        # Permission check: Manager can view all tasks; Worker can only view their assigned tasks
-        if token_data.role.value == "Worker" and task.assigned_to != token_data.sub:
-            return jsonify({"status": "error", "message": "Access denied"}), 403
-        
-        # Get container - with detailed validation
-        container = db.query(Container).filter(Container.container_id == task.container_id).first()
-        if not container:
-            print(f"❌ Container NOT FOUND for container_id = {task.container_id}")
-            return jsonify({"status": "error", "message": "Container not found"}), 404
-        
         print(f"✅ Container found:")
         print(f"  Container ID: {container.container_id}")
         print(f"  Label: {container.label}")
-        print(f"  Raw dimensions (from DB): width={container.width}, height={container.height}, depth={container.depth}")
-        print(f"  Data types: width={type(container.width)}, height={type(container.height)}, depth={type(container.depth)}")
-        
-        # Get items in the task
-        items = db.query(Item).filter(Item.task_id == task_id).all()
-        if not items:
-            print(f"❌ No items found for task {task_id}")
-            return jsonify({"status": "error", "message": "No items found for this task"}), 404
-        
-        print(f"✅ Found {len(items)} items for task {task_id}")
-        
-        # Convert to format required by AI API - validate the conversion process
-        print("📊 Converting container data:")
-        container_data = {
-            "width": float(container.width),
-            "height": float(container.height), 
-            "depth": float(container.depth)
-        }
-        print(f"  Before conversion (cm): {float(container.width)} x {float(container.height)} x {float(container.depth)}")
-        print(f"  After conversion (m):   {container_data['width']} x {container_data['height']} x {container_data['depth']}")
-        
-        # Validate converted data
+        print(f"  Dimensions (cm): {container_data['width']} x {container_data['height']} x {container_data['depth']}")
+        print(f"✅ Found {len(boxes_data)} items for task {task_id}")
+
+        # Validate container data
         if container_data['width'] <= 0 or container_data['height'] <= 0 or container_data['depth'] <= 0:
-            print(f"❌ Invalid container dimensions after conversion: {container_data}")
+            print(f"❌ Invalid container dimensions: {container_data}")
             return jsonify({"status": "error", "message": "Invalid container dimensions"}), 400
-        
-        boxes_data = [{
-            "item_id": item.item_id,
-            "width": float(item.width), 
-            "height": float(item.height),
-            "depth": float(item.depth),
-            "is_fragile": item.is_fragile
-        } for item in items]
-        
-        print(f"📦 Items data converted:")
-        for i, box in enumerate(boxes_data):
-            original_item = items[i]
-            print(f"  Item {box['item_id']}: {float(original_item.width)}x{float(original_item.height)}x{float(original_item.depth)}cm -> {box['width']:.3f}x{box['height']:.3f}x{box['depth']:.3f}m")
+
+        print(f"📦 Items data:")
+        for box in boxes_data:
+            print(f"  Item {box['item_id']}: {box['width']:.3f}x{box['height']:.3f}x{box['depth']:.3f}cm")
         
         # Calculate total volume - validate data consistency
         container_volume = container_data["width"] * container_data["height"] * container_data["depth"]
@@ -109,13 +95,22 @@ def optimize_task(token_data, task_id):
         print(f"  Items total volume: {items_volume:.4f} m³")
         print(f"  Volume ratio: {items_volume/container_volume:.2%}")
         
+        # Reject instances that provably cannot be packed without running the optimizer
+        reason = check_feasibility(container_data, boxes_data)
+        if reason:
+            print(f"❌ Pre-screen rejected task {task_id}: {reason['message']}")
+            return jsonify({"status": "error", "message": f"Optimization failed: {reason['message']}", "reason": reason}), 400
+
         print(f"🚀 Calling AI optimizer with:")
         print(f"  Container: {container_data}")
         print(f"  Number of boxes: {len(boxes_data)}")
         print("=" * 60)
         
-        # Call AI optimization algorithm
-        result = run_ai_optimizer(container_data, boxes_data)
+        # Call AI optimization algorithm, optionally within a time budget (?time_budget_ms=...), with a fixed seed (?seed=...)
+        # and in another mode (?mode=greedy|refine|beam, with ?beam_width=...). Repeated requests for the same container
+        # and items are served from the result cache unless ?refresh=true
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        result = run_cached_optimizer(db, container_data, boxes_data, refresh=refresh, **options)
         
         print(f"🎯 AI optimizer returned:")
         print(f"  Status: {result.get('status', 'unknown')}")
@@ -143,17 +138,7 @@ def optimize_task(token_data, task_id):
             db.commit()
             
         # Add task and container info to response result for frontend use
-        result["task_info"] = {
-            "task_id": task.task_id,
-            "task_name": task.task_name,
-            "container": {
-                "container_id": container.container_id,
-                "width": float(container.width),  # Unit: cm
-                "height": float(container.height),
-                "depth": float(container.depth),
-                "label": container.label
-            }
-        }
+        result["task_info"] = task_info(task, container)
         
         return jsonify(result), 200
         
@@ -228,4 +213,152 @@ def get_task_layout(token_data, task_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@bp.route("/optimize_task/<int:task_id>/jobs", methods=["POST"])
+@token_required
+def submit_optimize_task_job(token_data, task_id):
+    """Queue an optimization of the task in the background; poll /api/ai/jobs/<job_id> for the result"""
+    db = SessionLocal()
+    try:
+        options, error = task_optimizer_options(request.args)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        task, container, container_data, boxes_data, error = load_task_boxes(db, task_id, token_data)
+        if error:
+            return jsonify({"status": "error", "message": error[0]}), error[1]
+
+        reason = check_feasibility(container_data, boxes_data)
+        if reason:
+            return jsonify({"status": "error", "message": f"Optimization failed: {reason['message']}", "reason": reason}), 400
+
+        job_id = submit_job(
+            db, container_data, boxes_data, token_data.sub, task_id=task_id,
+            save_to_db=request.args.get('save', 'false').lower() == 'true',
+            options=dict(options, refresh=request.args.get('refresh', 'false').lower() == 'true'),
+            extra={"task_info": task_info(task, container)}
+        )
+        return jsonify({"status": "accepted", "job_id": job_id, "poll_url": f"/api/ai/jobs/{job_id}"}), 202
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    finally:
+        db.close()
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_job(token_data, job_id):
+    """Status, progress and (once completed) result of an optimization job"""
+    db = SessionLocal()
+    try:
+        job = db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).first()
+        if not job:
+            return jsonify({"status": "error", "message": "Job not found"}), 404
+
+        # Permission check: Manager can view all jobs; Worker can only view the jobs they submitted
+        if token_data.role.value == "Worker" and job.submitted_by != token_data.sub:
+            return jsonify({"status": "error", "message": "Access denied"}), 403
+
+        # A job whose process is gone would otherwise stay Queued/Running forever
+        if job_is_stale(job):
+            fail_stale_jobs(db, job_id)
+            db.refresh(job)
+
+        return jsonify(job_to_dict(job)), 200
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    finally:
+        db.close()
+
+@bp.route("/jobs/<job_id>/stream_token", methods=["POST"])
+@token_required
+def get_job_stream_token(token_data, job_id):
+    """Short-lived token for /api/ai/jobs/<job_id>/events?token=..., for clients that cannot set headers (EventSource)"""
+    db = SessionLocal()
+    try:
+        job = db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).first()
+        if not job:
+            return jsonify({"status": "error", "message": "Job not found"}), 404
+
+        # Permission check: Manager can view all jobs; Worker can only view the jobs they submitted
+        if token_data.role.value == "Worker" and job.submitted_by != token_data.sub:
+            return jsonify({"status": "error", "message": "Access denied"}), 403
+
+        token = create_stream_token(token_data, job_id)
+        return jsonify({"status": "success", "token": token, "events_url": f"/api/ai/jobs/{job_id}/events?token={token}"}), 200
+    finally:
+        db.close()
+
+@bp.route("/jobs/<job_id>/events", methods=["GET"])
+@stream_token_required
+def stream_job_events(token_data, job_id):
+    """Server-Sent Events stream of an optimization job.
+
+    Sends a "progress" event (iteration, temperature, current_cost, best_cost, progress and, once found, the best
+    layout so far) whenever the job reports progress, then a "done" event with the final job state. The stream reads
+    the job row, so it works from any worker, not only the one running the job.
+
+    Authenticates with the Authorization header or, for EventSource, ?token=<token from POST .../stream_token>.
+    At most SSE_MAX_STREAMS streams are open per process; further ones get a 503 with Retry-After.
+
+    A job whose process stopped is marked Failed (see jobs.fail_stale_jobs) and ends the stream with "done". Streams
+    are closed after SSE_MAX_DURATION seconds with a "timeout" event carrying the current job state; reconnecting
+    resumes with the latest progress event.
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).first()
+        if not job:
+            return jsonify({"status": "error", "message": "Job not found"}), 404
+
+        # Permission check: Manager can view all jobs; Worker can only view the jobs they submitted
+        if token_data.role.value == "Worker" and job.submitted_by != token_data.sub:
+            return jsonify({"status": "error", "message": "Access denied"}), 403
+    finally:
+        db.close()
+
+    if not open_streams.acquire(blocking=False):
+        return jsonify({"status": "error", "message": "Too many open event streams, poll the job instead"}), 503, \
+            {"Retry-After": str(SSE_MAX_DURATION)}
+
+    def generate():
+        last_event = None
+        deadline = time.time() + SSE_MAX_DURATION
+        while True:
+            db = SessionLocal()
+            try:
+                job = db.query(OptimizationJob).filter(OptimizationJob.job_id == job_id).first()
+                if job is None:
+                    return
+                if job_is_stale(job):
+                    fail_stale_jobs(db, job_id)
+                    db.refresh(job)
+                progress_event = job.progress_event
+                finished = job.status in (JobStatus.Completed, JobStatus.Failed)
+                expired = time.time() >= deadline
+                final_state = job_to_dict(job) if finished or expired else None
+            finally:
+                db.close()
+
+            if progress_event and progress_event != last_event:
+                last_event = progress_event
+                yield f"event: progress\ndata: {progress_event}\n\n"
+
+            if finished:
+                yield f"event: done\ndata: {json.dumps(final_state)}\n\n"
+                return
+            if expired:
+                yield f"event: timeout\ndata: {json.dumps(final_state)}\n\n"
+                return
+            time.sleep(SSE_POLL_INTERVAL)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(open_streams.release)  # Also runs when the client disconnects early
+    return response
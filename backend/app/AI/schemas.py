@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import Optional, List
+from app.AI.ai import MODES
 
 class BoxInput(BaseModel):
     item_id: int
@@ -7,13 +8,38 @@ class BoxInput(BaseModel):
     height: float
     depth: float
     is_fragile: bool = False
+    orientation: Optional[str] = None  # "Face Up", "Face Down", "Side A" or "Side B"; None allows every rotation
 
 class ContainerInput(BaseModel):
     width: float
     height: float
     depth: float
 
-class OptimizeRequest(BaseModel):
+# Optimizer options, from the /optimize body or the query string of the task routes (?mode=...&seed=...)
+class OptimizeOptions(BaseModel):
+    time_budget_ms: Optional[int] = None  # Wall-clock budget; the best layout found so far is returned when it runs out
+    mode: str = "search"  # "search", "greedy" (first-fit decreasing, tens of milliseconds), "refine" (greedy + one annealing run) or "beam"
+    beam_width: Optional[int] = None  # Partial layouts kept per step in "beam" mode (default 4); runtime grows linearly with it
+    seed: Optional[int] = None  # Same seed, same layout (without a time budget); the seed used is returned in the result
+
+    @validator('time_budget_ms')
+    def time_budget_positive(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError('time_budget_ms must be a positive number of milliseconds')
+        return v
+
+    @validator('mode')
+    def mode_known(cls, v):
+        if v not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        return v
+
+    @validator('beam_width')
+    def beam_width_positive(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('beam_width must be at least 1')
+        return v
+
+class OptimizeRequest(OptimizeOptions):
     container: ContainerInput
     boxes: List[BoxInput]
-
@@ -0,0 +1,69 @@
+from app.AI.schemas import OptimizeOptions
+from app.Task.models import Task
+from app.Container.models import Container
+from app.Item.models import Item
+
+# Loading a task's container and items into the dicts run_ai_optimizer takes (dimensions in cm) and reading the
+# optimizer options, shared by the synchronous and background optimization routes of the AI and Task blueprints.
+
+
+# Returns (task, container, container_data, boxes_data, error). error is None or a (message, status code) pair: 404
+# when the task, its container or its items are missing, 403 when token_data is a Worker not assigned to the task
+# (pass token_data=None when the route already restricts the caller).
+def load_task_boxes(db, task_id, token_data=None):
+    task = db.query(Task).filter(Task.task_id == task_id).first()
+    if not task:
+        return None, None, None, None, ("Task not found", 404)
+
+    # Permission check: Manager can use all tasks; Worker can only use their assigned tasks
+    if token_data is not None and token_data.role.value == "Worker" and task.assigned_to != token_data.sub:
+        return task, None, None, None, ("Access denied", 403)
+
+    container = db.query(Container).filter(Container.container_id == task.container_id).first()
+    if not container:
+        return task, None, None, None, ("Container not found", 404)
+
+    items = db.query(Item).filter(Item.task_id == task_id).all()
+    if not items:
+        return task, container, None, None, ("No items found for this task", 404)
+
+    container_data = {
+        "width": float(container.width),
+        "height": float(container.height),
+        "depth": float(container.depth)
+    }
+    boxes_data = [{
+        "item_id": item.item_id,
+        "width": float(item.width),
+        "height": float(item.height),
+        "depth": float(item.depth),
+        "is_fragile": item.is_fragile,
+        "orientation": item.orientation
+    } for item in items]
+    return task, container, container_data, boxes_data, None
+
+
+# Task and container info added to results for frontend use
+def task_info(task, container):
+    return {
+        "task_id": task.task_id,
+        "task_name": task.task_name,
+        "container": {
+            "container_id": container.container_id,
+            "width": float(container.width),  # Unit: cm
+            "height": float(container.height),
+            "depth": float(container.depth),
+            "label": container.label
+        }
+    }
+
+
+# Optimizer options from the query string of the task routes (?time_budget_ms=...&mode=...&beam_width=...&seed=...),
+# validated like the /optimize body so bad values get a 400 before anything runs or a job is queued. Returns
+# (options, error message); options only holds the parameters that were given.
+def task_optimizer_options(args):
+    try:
+        options = OptimizeOptions(**args.to_dict())
+    except ValueError as e:
+        return None, f"Validation error: {str(e)}"
+    return options.dict(exclude_unset=True), None
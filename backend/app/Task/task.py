@@ -5,8 +5,10 @@ from app.db.database import SessionLocal
 from app.auth.auth import token_required
 from app.Task.models import Task, TaskStatus
 from app.auth.models import UserRole
-from app.AI.ai import run_ai_optimizer
-from app.Container.models import Container
+from app.AI.ai import check_feasibility
+from app.AI.cache import run_cached_optimizer
+from app.AI.jobs import submit_job
+from app.AI.tasks import load_task_boxes, task_optimizer_options
 from app.Item.models import Item
 
 bp = Blueprint('task', __name__)
@@ -320,38 +322,24 @@ def optimize_task_placement(token_data, task_id):
     
     db: Session = SessionLocal()
     try:
-        # Get task
-        task = db.query(Task).filter(Task.task_id == task_id).first()
-        if not task:
-            return jsonify({"status": "error", "message": "Task not found"}), 404
-        
-        # Get container
-        container = db.query(Container).filter(Container.container_id == task.container_id).first()
-        if not container:
-            return jsonify({"status": "error", "message": "Container not found"}), 404
-        
-        # Get items in task
-        items = db.query(Item).filter(Item.task_id == task_id).all()
-        if not items:
-            return jsonify({"status": "error", "message": "No items found for this task"}), 404
-        
-        # Convert to format required by AI API
-        container_data = {
-            "width": float(container.width),
-            "height": float(container.height), 
-            "depth": float(container.depth)
-        }
-        
-        boxes_data = [{
-            "item_id": item.item_id,
-            "width": float(item.width),
-            "height": float(item.height),
-            "depth": float(item.depth),
-            "is_fragile": item.is_fragile
-        } for item in items]
-        
-        # Directly call AI optimization function (not via requests)
-        result = run_ai_optimizer(container_data, boxes_data)
+        options, error = task_optimizer_options(request.args)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        task, container, container_data, boxes_data, error = load_task_boxes(db, task_id)
+        if error:
+            return jsonify({"status": "error", "message": error[0]}), error[1]
+
+        # Reject instances that provably cannot be packed without running the optimizer
+        reason = check_feasibility(container_data, boxes_data)
+        if reason:
+            return jsonify({"status": "error", "message": f"Optimization failed: {reason['message']}", "reason": reason}), 400
+
+        # Directly call AI optimization function (not via requests), through the result cache unless ?refresh=true.
+        # ?seed=... fixes the optimizer seed so the layout can be reproduced; ?mode=greedy|refine|beam (with ?beam_width=...)
+        # and ?time_budget_ms=... trade quality for speed
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        result = run_cached_optimizer(db, container_data, boxes_data, refresh=refresh, **options)
         
         # Save optimization result to database
         if result.get("status") == "success":
@@ -372,6 +360,40 @@ def optimize_task_placement(token_data, task_id):
     finally:
         db.close()
 
+@bp.route("/api/manager/optimize_task/<int:task_id>/jobs", methods=["POST"])
+@token_required
+def submit_optimize_task_placement_job(token_data, task_id):
+    """Manager queues a background optimization of the task; the result is saved to the items when it completes"""
+    if token_data.role != UserRole.Manager:
+        return jsonify({"status": "error", "message": "Forbidden"}), 403
+
+    db: Session = SessionLocal()
+    try:
+        options, error = task_optimizer_options(request.args)
+        if error:
+            return jsonify({"status": "error", "message": error}), 400
+
+        task, container, container_data, boxes_data, error = load_task_boxes(db, task_id)
+        if error:
+            return jsonify({"status": "error", "message": error[0]}), error[1]
+
+        # Reject instances that provably cannot be packed without queueing a job
+        reason = check_feasibility(container_data, boxes_data)
+        if reason:
+            return jsonify({"status": "error", "message": f"Optimization failed: {reason['message']}", "reason": reason}), 400
+
+        job_id = submit_job(
+            db, container_data, boxes_data, token_data.sub, task_id=task_id, save_to_db=True,
+            options=dict(options, refresh=request.args.get('refresh', 'false').lower() == 'true')
+        )
+        return jsonify({"status": "accepted", "job_id": job_id, "poll_url": f"/api/ai/jobs/{job_id}"}), 202
+
+    except Exception as e:
+        db.rollback()
+        return jsonify({"status": "error", "message": str(e)}), 400
+    finally:
+        db.close()
+
 @bp.route("/api/worker/complete_task/<int:task_id>", methods=["PUT"])
 @token_required
 def complete_task(token_data, task_id):
@@ -6,7 +6,7 @@ from flask import request, jsonify
 from functools import wraps
 from .schemas import TokenData
 from app.auth.models import UserRole
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, STREAM_TOKEN_EXPIRE_MINUTES
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -33,6 +33,8 @@ def verify_token(token: str) -> Optional[TokenData]:
         role: str = payload.get("role")
         if username is None or role is None:
             return None
+        if payload.get("job_id") is not None:  # Stream tokens only open their job's event stream
+            return None
         return TokenData(sub=payload.get("sub"), role=payload.get("role"))
 
     except JWTError:
@@ -57,6 +59,42 @@ def token_required(f):
         return f(token_data=token_data, *args, **kwargs)
     return decorated 
 
+# A browser EventSource cannot send the Authorization header, so job event streams also accept a short-lived token
+# in the query string. It is scoped to one job, so a leaked URL (logs, history) exposes only that job's progress.
+def create_stream_token(token_data: TokenData, job_id: str) -> str:
+    return create_access_token(
+        {"sub": token_data.sub, "role": token_data.role.value, "job_id": job_id},
+        expires_delta=timedelta(minutes=STREAM_TOKEN_EXPIRE_MINUTES)
+    )
+
+def verify_stream_token(token: str, job_id: str) -> Optional[TokenData]:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("job_id") != job_id or payload.get("sub") is None or payload.get("role") is None:
+            return None
+        return TokenData(sub=payload.get("sub"), role=payload.get("role"))
+
+    except JWTError:
+        return None
+
+# token_required for job event streams: the Authorization header, or ?token=<stream token for this job>
+def stream_token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.headers.get('Authorization'):
+            return token_required(f)(*args, **kwargs)
+
+        token = request.args.get('token')
+        if not token:
+            return jsonify({'message': 'Token is missing!'}), 401
+
+        token_data = verify_stream_token(token, kwargs.get('job_id'))
+        if not token_data:
+            return jsonify({'message': 'Invalid token!'}), 401
+
+        return f(token_data=token_data, *args, **kwargs)
+    return decorated
+
 class TokenData:
     def __init__(self, sub: str, role: str):
         self.sub = sub  # username from token
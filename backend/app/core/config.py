@@ -8,6 +8,24 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "4745622e956c078f49c256e39467afc4a14cec43f9404273d3ce4fc7b434acf4")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+STREAM_TOKEN_EXPIRE_MINUTES = 15  # Lifetime of the job event stream tokens (see app/auth/auth.py)
 
 # Database Configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////app/app/db/app.db")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:////app/app/db/app.db")
+
+# AI Optimizer Configuration
+# Processes used for the independent annealing restarts; 0 means one per CPU core
+AI_OPTIMIZER_WORKERS = int(os.getenv("AI_OPTIMIZER_WORKERS", "0"))
+# Iterations without improvement before a search stops early; 0 disables the stagnation stop
+AI_OPTIMIZER_PATIENCE = int(os.getenv("AI_OPTIMIZER_PATIENCE", "300"))
+# Optimization result cache: entries kept in each process, and rows kept in the optimization_results table
+AI_RESULT_CACHE_SIZE = int(os.getenv("AI_RESULT_CACHE_SIZE", "128"))
+AI_RESULT_CACHE_DB_SIZE = int(os.getenv("AI_RESULT_CACHE_DB_SIZE", "1000"))
+# Background optimization jobs run concurrently per process (each job may use AI_OPTIMIZER_WORKERS processes itself)
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+# Seconds without a heartbeat after which a Queued/Running job counts as lost (its process exited) and is marked Failed
+AI_JOB_STALE_AFTER = int(os.getenv("AI_JOB_STALE_AFTER", "60"))
+# Cell size in cm of the height map used by placement mode "heightmap"
+AI_HEIGHTMAP_RESOLUTION = float(os.getenv("AI_HEIGHTMAP_RESOLUTION", "2"))
+# Add engine counters and phase timers as a "stats" block to optimizer results
+AI_OPTIMIZER_STATS = os.getenv("AI_OPTIMIZER_STATS", "false").lower() == "true"
@@ -10,6 +10,8 @@ from app.auth.models import Base, User, UserRole
 from app.Item.models import Item
 from app.Task.models import Task, TaskStatus
 from app.Container.models import Container
+from app.AI.models import OptimizationResult, OptimizationJob
+from app.AI.jobs import fail_stale_jobs
 
 from app.auth.auth import get_password_hash
 
@@ -91,7 +93,11 @@ def create_app():
                 "containers": "/api/manager/add_container",
                 "ai_optimize": "/api/ai/optimize",
                 "ai_optimize_task": "/api/ai/optimize_task/<task_id>",
-                "ai_get_layout": "/api/ai/get_task_layout/<task_id>"
+                "ai_get_layout": "/api/ai/get_task_layout/<task_id>",
+                "ai_optimize_task_job": "/api/ai/optimize_task/<task_id>/jobs",
+                "ai_job": "/api/ai/jobs/<job_id>",
+                "ai_job_stream_token": "/api/ai/jobs/<job_id>/stream_token",
+                "ai_job_events": "/api/ai/jobs/<job_id>/events"
             }
         })
     
@@ -123,6 +129,14 @@ with app.app_context():
     Base.metadata.create_all(bind=engine)
     # automatically create default users
     create_default_users()
+    # Jobs left Queued/Running by a process that has exited since will never finish
+    db = SessionLocal()
+    try:
+        lost_jobs = fail_stale_jobs(db)
+        if lost_jobs:
+            print(f"⚠️ Marked {lost_jobs} lost optimization job(s) as failed")
+    finally:
+        db.close()
 
 # For direct local runs (optional)
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+# Seeded instance generators for the packing benchmarks.
+# Every generator returns (container, boxes) in the centimeter request format run_ai_optimizer takes:
+#     container = {"width", "height", "depth"}, boxes = [{"item_id", "width", "height", "depth", "is_fragile"}, ...]
+# The same (instance class, item count, seed) always produces the same instance.
+#
+# The container cross-section is the Bischoff-Ratcliff one (233 x 220 cm, width x height); its depth is chosen so the
+# items fill FILL_RATIO of the container, which keeps every class comparable from 10 to 500 items.
+import math
+import random
+
+CROSS_SECTION = (233.0, 220.0)  # width, height in cm
+FILL_RATIO = 0.5
+
+# Bischoff-Ratcliff style classes: the number of box types grows from weakly to strongly heterogeneous
+BR_TYPE_COUNTS = {"br1": 3, "br2": 5, "br3": 8, "br4": 10, "br5": 12, "br6": 15, "br7": 20}
+
+
+def container_for(boxes, fill_ratio=FILL_RATIO):
+    width, height = CROSS_SECTION
+    volume = sum(b["width"] * b["height"] * b["depth"] for b in boxes)
+    longest = max(max(b["width"], b["height"], b["depth"]) for b in boxes)
+    depth = max(math.ceil(volume / fill_ratio / (width * height)), math.ceil(longest))
+    return {"width": width, "height": height, "depth": float(depth)}
+
+
+def make_boxes(sizes, fragile_flags):
+    return [
+        {"item_id": idx + 1, "width": w, "height": h, "depth": d, "is_fragile": fragile}
+        for idx, ((w, h, d), fragile) in enumerate(zip(sizes, fragile_flags))
+    ]
+
+
+# One box size for every item
+def homogeneous(count, seed, fragile_ratio=0.1):
+    rng = random.Random(seed)
+    size = (float(rng.randint(30, 60)), float(rng.randint(25, 50)), float(rng.randint(20, 45)))
+    boxes = make_boxes([size] * count, [rng.random() < fragile_ratio for _ in range(count)])
+    return container_for(boxes), boxes
+
+
+# Every item its own random size
+def heterogeneous(count, seed, fragile_ratio=0.2):
+    rng = random.Random(seed)
+    sizes = [(float(rng.randint(10, 80)), float(rng.randint(10, 80)), float(rng.randint(10, 80))) for _ in range(count)]
+    boxes = make_boxes(sizes, [rng.random() < fragile_ratio for _ in range(count)])
+    return container_for(boxes), boxes
+
+
+# Heterogeneous sizes with most of the items fragile, so little can be stacked
+def fragile_heavy(count, seed):
+    return heterogeneous(count, seed, fragile_ratio=0.6)
+
+
+# Bischoff-Ratcliff style: a few box types (length 30-120, width 25-100, height 20-80 cm), items drawn among them
+def bischoff_ratcliff(count, seed, type_count, fragile_ratio=0.1):
+    rng = random.Random(seed * 100 + type_count)
+    types = [
+        (float(rng.randint(30, 120)), float(rng.randint(20, 80)), float(rng.randint(25, 100)))
+        for _ in range(type_count)
+    ]
+    sizes = [rng.choice(types) for _ in range(count)]
+    boxes = make_boxes(sizes, [rng.random() < fragile_ratio for _ in range(count)])
+    return container_for(boxes), boxes
+
+
+INSTANCE_CLASSES = {
+    "homogeneous": homogeneous,
+    "heterogeneous": heterogeneous,
+    "fragile_heavy": fragile_heavy,
+    **{name: (lambda count, seed, types=types: bischoff_ratcliff(count, seed, types)) for name, types in BR_TYPE_COUNTS.items()}
+}
+
+
+def generate(instance_class, count, seed):
+    if instance_class not in INSTANCE_CLASSES:
+        raise ValueError(f"Unknown instance class '{instance_class}', expected one of {list(INSTANCE_CLASSES)}")
+    return INSTANCE_CLASSES[instance_class](count, seed)
@@ -0,0 +1,64 @@
+# Compare the contact placement (try_place_with_contact_priority) with the height-map placement mode.
+# For every instance both modes run one advanced_cost_function evaluation on the same volume-sorted boxes and report
+# wall time, whether every box was placed, the cost, and the volume utilization of the occupied part of the container.
+#
+# Usage (from the backend directory):
+#     python -m benchmarks.placement_modes [--seeds 5] [--sizes 20 60 120]
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from app.AI.optimizer.box import Box
+from app.AI.optimizer.cost_functions import advanced_cost_function, PLACEMENT_MODES
+
+CONTAINER = {"width": 2.4, "height": 2.4, "depth": 6.0}  # meters
+
+
+def random_boxes(count, seed, fragile_ratio=0.2):
+    rng = random.Random(seed)
+    return [
+        Box(
+            item_id=idx + 1,
+            original_width=rng.choice([0.2, 0.3, 0.4, 0.5, 0.6]),
+            original_height=rng.choice([0.2, 0.3, 0.4, 0.5]),
+            original_depth=rng.choice([0.2, 0.3, 0.4, 0.6]),
+            is_fragile=rng.random() < fragile_ratio
+        ) for idx in range(count)
+    ]
+
+
+def run_mode(boxes, container, placement_mode):
+    boxes = [b.copy() for b in boxes]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Silence per-box placement failures
+        cost = advanced_cost_function(boxes, container, placement_mode=placement_mode)
+    elapsed = time.perf_counter() - start
+
+    feasible = cost < 1e12
+    used_depth = max(b.z + b.depth for b in boxes) if feasible else container["depth"]
+    volume = sum(b.width * b.height * b.depth for b in boxes)
+    utilization = volume / (container["width"] * container["height"] * used_depth) if feasible else 0.0
+    return {"time": elapsed, "feasible": feasible, "cost": cost, "utilization": utilization}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seeds", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 60, 120])
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'mode':>10} {'time(s)':>9} {'feasible':>9} {'utilization':>12} {'mean cost':>14}")
+    for size in args.sizes:
+        for mode in PLACEMENT_MODES:
+            runs = [run_mode(random_boxes(size, seed), CONTAINER, mode) for seed in range(args.seeds)]
+            feasible = [r for r in runs if r["feasible"]]
+            mean_time = sum(r["time"] for r in runs) / len(runs)
+            mean_util = sum(r["utilization"] for r in feasible) / len(feasible) if feasible else 0.0
+            mean_cost = sum(r["cost"] for r in feasible) / len(feasible) if feasible else float("inf")
+            print(f"{size:>6} {mode:>10} {mean_time:>9.3f} {len(feasible):>5}/{len(runs):<3} {mean_util:>12.2%} {mean_cost:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compare search strategies of run_ai_optimizer head to head, by default a single simulated annealing run against
+# the BRKGA engine. Every instance runs once per strategy, each in a fresh process with the same seed and time budget
+# (see suite.run_instance), and the table shows throughput (evaluations per second), volume utilization and cost.
+#
+# Usage (from the backend directory):
+#     python -m benchmarks.strategies [--strategies anneal brkga] [--classes heterogeneous br4] [--sizes 20 60] [--seeds 2]
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.instances import INSTANCE_CLASSES
+from benchmarks.suite import run_instance
+
+DEFAULT_STRATEGIES = ["anneal", "brkga"]
+DEFAULT_CLASSES = ["heterogeneous", "fragile_heavy", "br4"]
+DEFAULT_SIZES = [20, 60]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare optimizer strategies on generated packing instances")
+    parser.add_argument("--strategies", nargs="+", default=DEFAULT_STRATEGIES)
+    parser.add_argument("--classes", nargs="+", default=DEFAULT_CLASSES, choices=list(INSTANCE_CLASSES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seeds", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1, help="optimizer processes per instance")
+    parser.add_argument("--time-budget-ms", type=int, default=10000)
+    parser.add_argument("--placement-mode", default="contact")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    totals = {strategy: {"rate": 0.0, "utilization": 0.0, "feasible": 0} for strategy in args.strategies}
+    print(f"{'instance':>22} {'strategy':>10} {'runtime':>9} {'ev/s':>10} {'utilization':>12} {'cost':>16}")
+    for instance_class in args.classes:
+        for size in args.sizes:
+            for seed in range(args.seeds):
+                for strategy in args.strategies:
+                    options = {
+                        "runs": 1,
+                        "workers": args.workers,
+                        "time_budget_ms": args.time_budget_ms,
+                        "placement_mode": args.placement_mode,
+                        "strategy": strategy
+                    }
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        row = pool.submit(run_instance, instance_class, size, seed, options).result()
+                    # Infeasible runs fail fast, so only feasible ones count towards the means
+                    if row["cost"] is not None:
+                        totals[strategy]["feasible"] += 1
+                        totals[strategy]["rate"] += row["evaluations_per_second"] or 0
+                        totals[strategy]["utilization"] += row["utilization"]
+                    cost = "infeasible" if row["cost"] is None else f"{row['cost']:.1f}"
+                    print(f"{row['instance']:>22} {strategy:>10} {row['runtime_s']:>8.2f}s "
+                          f"{row['evaluations_per_second'] or 0:>10.1f} {row['utilization'] or 0:>12.2%} {cost:>16}")
+
+    instances = len(args.classes) * len(args.sizes) * args.seeds
+    print()
+    for strategy, total in totals.items():
+        feasible = max(total["feasible"], 1)
+        print(f"{strategy:>10}: mean {total['rate'] / feasible:.1f} ev/s, mean utilization {total['utilization'] / feasible:.2%} "
+              f"({total['feasible']}/{instances} feasible)")
+
+
+if __name__ == "__main__":
+    main()
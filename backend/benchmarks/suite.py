@@ -0,0 +1,159 @@
+# Benchmark suite for run_ai_optimizer over the generated instance classes in benchmarks/instances.py.
+# Each (class, size, seed) instance runs in a fresh process, so peak memory is measured per instance, and records:
+# status, runtime, evaluations per second (from the optimizer's stats block), peak RSS, final cost and volume
+# utilization of the occupied part of the container. Results go to a JSON file that --compare can diff against
+# the file of another commit.
+#
+# Usage (from the backend directory):
+#     python -m benchmarks.suite [--classes homogeneous br3] [--sizes 10 50 100] [--seeds 3] [--output out.json]
+#     python -m benchmarks.suite --compare base.json new.json
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from benchmarks.instances import INSTANCE_CLASSES, generate
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEFAULT_CLASSES = ["homogeneous", "heterogeneous", "fragile_heavy", "br1", "br4", "br7"]
+DEFAULT_SIZES = [10, 50, 100]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux; include optimizer worker processes
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024, 1)
+
+
+def utilization(container, results):
+    if not results:
+        return 0.0
+    used_depth = max(r["z"] + r["depth"] for r in results)
+    volume = sum(r["width"] * r["height"] * r["depth"] for r in results)
+    return volume / (container["width"] * container["height"] * used_depth)
+
+
+# Runs in its own process
+def run_instance(instance_class, size, seed, options):
+    from app.AI.ai import run_ai_optimizer
+
+    container, boxes = generate(instance_class, size, seed)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Silence optimizer logging
+        result = run_ai_optimizer(container, boxes, seed=seed, collect_stats=True, **options)
+    runtime = time.perf_counter() - start
+
+    stats = result.get("stats", {})
+    feasible = result.get("status") == "success"
+    return {
+        "instance": f"{instance_class}-{size}-{seed}",
+        "class": instance_class,
+        "items": size,
+        "seed": seed,
+        "status": result.get("status"),
+        "runtime_s": round(runtime, 3),
+        "evaluations": stats.get("counters", {}).get("evaluations", 0),
+        "evaluations_per_second": stats.get("evaluations_per_second"),
+        "peak_rss_mb": peak_rss_mb(),
+        "cost": result["cost"] if feasible else None,
+        "utilization": round(utilization(container, result["results"]), 4) if feasible else None
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(classes, sizes, seeds, options):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for instance_class in classes:
+        for size in sizes:
+            for seed in range(seeds):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    row = pool.submit(run_instance, instance_class, size, seed, options).result()
+                results.append(row)
+                print(f"{row['instance']:>22} {row['status']:>8} {row['runtime_s']:>9.2f}s "
+                      f"{row['evaluations_per_second'] or 0:>9.1f} ev/s {row['peak_rss_mb'] or 0:>8.1f} MB "
+                      f"util {row['utilization'] or 0:>6.2%}")
+    return results
+
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = {row["instance"]: row for row in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'instance':>22} {'runtime':>18} {'ev/s':>20} {'utilization':>20} {'cost':>14}")
+    for row in new:
+        old = base.get(row["instance"])
+        if old is None:
+            continue
+        runtime = f"{old['runtime_s']:.2f}->{row['runtime_s']:.2f}s"
+        speed = f"{old['evaluations_per_second'] or 0:.0f}->{row['evaluations_per_second'] or 0:.0f}"
+        util = f"{old['utilization'] or 0:.2%}->{row['utilization'] or 0:.2%}"
+        cost = "n/a" if old["cost"] is None or row["cost"] is None else f"{row['cost'] - old['cost']:+.1f}"
+        print(f"{row['instance']:>22} {runtime:>18} {speed:>20} {util:>20} {cost:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run_ai_optimizer on generated packing instances")
+    parser.add_argument("--classes", nargs="+", default=DEFAULT_CLASSES, choices=list(INSTANCE_CLASSES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="item counts (10 to 500)")
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=3, help="annealing restarts per instance")
+    parser.add_argument("--workers", type=int, default=1, help="optimizer processes per instance")
+    parser.add_argument("--time-budget-ms", type=int, default=30000)
+    parser.add_argument("--placement-mode", default="contact")
+    parser.add_argument("--strategy", default="anneal", help="anneal, tempering or brkga")
+    parser.add_argument("--output", help="JSON results file (default benchmark-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="diff two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    options = {
+        "runs": args.runs,
+        "workers": args.workers,
+        "time_budget_ms": args.time_budget_ms,
+        "placement_mode": args.placement_mode,
+        "strategy": args.strategy
+    }
+    commit = git_commit()
+    results = run_suite(args.classes, args.sizes, args.seeds, options)
+
+    output = args.output or f"benchmark-{commit or 'unknown'}.json"
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "options": options,
+            "results": results
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()